@@ -0,0 +1,71 @@
+"""
+Microbenchmark of soe.run._fingerprint against the previous string-building
+implementation, over values typical of traced code.
+
+    python benchmarks/fingerprint.py [--number N]
+"""
+import argparse
+import array
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from soe.run import _fingerprint  # noqa: E402
+
+
+def legacy_fingerprint(val) -> str:
+    """The unbounded implementation that _fingerprint replaced."""
+    if val is None or isinstance(val, (int, float, str, bool)):
+        return f"{type(val).__name__}:{val!r}"
+    if isinstance(val, (list, tuple)):
+        inner = ",".join(legacy_fingerprint(x) for x in val)
+        return f"{type(val).__name__}:[{inner}]"
+    if isinstance(val, dict):
+        items = sorted(val.items(), key=lambda kv: str(kv[0]))
+        inner = ",".join(f"{str(k)!r}:{legacy_fingerprint(v)}" for k, v in items)
+        return f"dict:{{{inner}}}"
+    cls = val.__class__
+    return f"{cls.__module__}.{cls.__qualname__}:{repr(val)}"
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+
+def representative_values() -> dict:
+    values = {
+        "int": 42,
+        "short str": "hello world",
+        "long str (1 MB)": "x" * 1_000_000,
+        "list[int] (10k)": list(range(10_000)),
+        "nested dict": {f"k{i}": {"a": [i, i + 1], "b": (str(i), float(i))} for i in range(200)},
+        "bytes (4 MB)": os.urandom(4 * 1024 * 1024),
+        "array('d') (1M)": array.array("d", range(1_000_000)),
+        "list[Point] (1k)": [Point(i, -i) for i in range(1000)],
+    }
+    try:
+        import numpy as np
+        values["ndarray float64 (1000x1000)"] = np.random.rand(1000, 1000)
+        values["ndarray transposed"] = np.random.rand(1000, 1000).T
+    except ImportError:
+        pass
+    return values
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--number", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'value':<28} {'legacy':>12} {'bounded':>12} {'speedup':>9}")
+    for name, val in representative_values().items():
+        old = min(timeit.repeat(lambda: legacy_fingerprint(val), number=args.number, repeat=3)) / args.number
+        new = min(timeit.repeat(lambda: _fingerprint(val), number=args.number, repeat=3)) / args.number
+        print(f"{name:<28} {old * 1e6:10.1f}us {new * 1e6:10.1f}us {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
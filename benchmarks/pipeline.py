@@ -0,0 +1,215 @@
+"""
+Offline benchmark of every soe pipeline phase on a synthetic repository.
+
+    python benchmarks/pipeline.py [--files N] [--functions N] [--fanout N]
+        [--arity N] [--class-depth N] [--repeat N] [--jobs N]
+        [--phases a,b,...] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance X]
+
+Generates a repository with `synthetic_repo.py` in a temporary directory
+and times each phase separately:
+
+    collect      function_list.collect_functions_in_repo (no AST cache)
+    graph        function_list.build_dependency_graph
+    freq_list    freq_list.get_function_list (process pool fuzzing)
+    fuzz         fuzzer.fuzz (tracing every function)
+    save_state   soe.save_state (function_list.pkl, call_graph.pkl)
+    load_state   unpickling both files again
+
+Results (best and median of `--repeat` runs, in seconds) are printed and
+written as JSON. With a baseline of the same repository configuration,
+every phase is compared to it and the exit status is 1 when one is slower
+than `--tolerance` times its baseline. `--save-baseline` overwrites the
+baseline with this run instead.
+"""
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from synthetic_repo import RepoConfig, add_config_arguments, config_from_args, generate_repo  # noqa: E402
+import soe._global as _global  # noqa: E402
+import soe.run as soe_run  # noqa: E402
+from soe import freq_list  # noqa: E402
+from soe.fuzzer import fuzz  # noqa: E402
+from soe.soe import save_state  # noqa: E402
+from soe.function_list.function_list import (  # noqa: E402
+    collect_functions_in_repo, build_dependency_graph, is_public_function
+)
+
+PHASES = ["collect", "graph", "freq_list", "fuzz", "save_state", "load_state"]
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+SCHEMA = 1
+
+
+@contextlib.contextmanager
+def _quiet(cwd=None):
+    """Silence stdout (freq_list reports progress there), optionally in `cwd`."""
+    old = os.getcwd()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if cwd is not None:
+            os.chdir(cwd)
+        try:
+            yield
+        finally:
+            os.chdir(old)
+
+
+class Pipeline:
+    """State shared by the phases, each phase uses what the previous ones built."""
+
+    def __init__(self, root: str, work: str, jobs: int):
+        self.root = root
+        self.work = Path(work)
+        self.jobs = jobs
+        self.functions = None
+        self.graph = None
+
+    def phase_collect(self):
+        self.functions = collect_functions_in_repo(self.root)
+
+    def phase_graph(self):
+        self.graph = build_dependency_graph(self.functions)
+
+    def phase_freq_list(self):
+        # Results and logs go to the working directory
+        with _quiet(self.work):
+            freq_list.get_function_list(self.root, processes=self.jobs, timings_file=None)
+
+    def _reset_state(self):
+        _global.init_global()
+        _global.set_function_list({
+            q: f.to_json_dict(self.graph) for q, f in self.functions.items() if is_public_function(f)
+        })
+        _global.set_call_graph(self.graph)
+        soe_run.type_list.clear()
+        soe_run._type_seen.clear()
+
+    def phase_fuzz(self):
+        out = self.work / "fuzz"
+        out.mkdir(exist_ok=True)
+        with _quiet():
+            fuzz(Path(self.root), out, jobs=self.jobs)
+
+    def phase_save_state(self):
+        save_state(self.work / "state")
+
+    def phase_load_state(self):
+        for name in ("function_list.pkl", "call_graph.pkl"):
+            with open(self.work / "state" / name, "rb") as f:
+                pickle.load(f)
+
+    def run_phase(self, name: str) -> float:
+        fn = getattr(self, f"phase_{name}")
+        if name == "fuzz":
+            self._reset_state()
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+
+def run_suite(cfg: RepoConfig, phases: list[str], repeat: int, jobs: int) -> dict:
+    timings = {name: [] for name in phases}
+    with tempfile.TemporaryDirectory(prefix="soe-bench-") as tmp:
+        root = os.path.join(tmp, "repo")
+        generate_repo(root, cfg)
+        work = os.path.join(tmp, "work")
+        os.makedirs(work)
+        sys.path.insert(0, root)
+        try:
+            pipeline = Pipeline(root, work, jobs)
+            # Later phases need the function list, graph and saved state
+            needed = PHASES[:max(PHASES.index(p) for p in phases) + 1]
+            for _ in range(repeat):
+                for name in needed:
+                    elapsed = pipeline.run_phase(name)
+                    if name in timings:
+                        timings[name].append(elapsed)
+        finally:
+            sys.path.remove(root)
+            _global.init_global()
+
+    return {
+        "schema": SCHEMA,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": cfg.to_dict(),
+        "jobs": jobs,
+        "repeat": repeat,
+        "phases": {
+            name: {"best": min(runs), "median": statistics.median(runs), "runs": runs}
+            for name, runs in timings.items()
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print each phase against the baseline. Returns the phases over `tolerance`."""
+    if baseline.get("config") != results["config"] or baseline.get("jobs") != results["jobs"]:
+        print("Baseline was recorded for another repository configuration or job count, not comparing")
+        return []
+    regressions = []
+    print(f"\n{'phase':<12} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name, timing in results["phases"].items():
+        base = baseline["phases"].get(name)
+        if base is None:
+            continue
+        ratio = timing["best"] / base["best"] if base["best"] else float("inf")
+        flag = "  SLOWER" if ratio > tolerance else ""
+        print(f"{name:<12} {base['best'] * 1e3:8.1f}ms {timing['best'] * 1e3:8.1f}ms {ratio:6.2f}x{flag}")
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_config_arguments(ap)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--jobs", type=int, default=1, help="worker processes of freq_list and fuzz")
+    ap.add_argument("--phases", default=",".join(PHASES), help="comma-separated subset of " + ", ".join(PHASES))
+    ap.add_argument("--output", default="pipeline_results.json")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown against the baseline")
+    args = ap.parse_args()
+
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        ap.error(f"unknown phases: {', '.join(sorted(unknown))}")
+
+    results = run_suite(config_from_args(args), phases, args.repeat, args.jobs)
+    print(f"Python {results['python']}, {results['config']}")
+    print(f"{'phase':<12} {'best':>10} {'median':>10}")
+    for name, timing in results["phases"].items():
+        print(f"{name:<12} {timing['best'] * 1e3:8.1f}ms {timing['median'] * 1e3:8.1f}ms")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Slower than {args.tolerance}x baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Generator of synthetic Python repositories for the pipeline benchmarks.
+
+    python benchmarks/synthetic_repo.py OUT_DIR [--files N] [--functions N]
+        [--fanout N] [--arity N] [--class-depth N] [--seed N]
+
+The repository is one package, `synth`, of `files` modules. Every module
+defines `functions` top-level functions of `arity` parameters and a chain
+of `class_depth` classes, each inheriting from the previous one and adding
+a method. Functions call `fanout` functions of the previous module, and
+modules are stacked in `LEVELS` levels, so call chains (and the work of a
+traced call) stay bounded however large the repository is. The bodies only
+build a list and return its length, so they run with arguments of any
+type, and their results (fed back as fuzz inputs) do not grow.
+"""
+import argparse
+import os
+import random
+from dataclasses import dataclass, asdict
+
+
+# Depth of the call chains: module i calls into module i - 1 unless i % LEVELS == 0
+LEVELS = 4
+
+
+@dataclass
+class RepoConfig:
+    files: int = 50
+    functions: int = 20
+    fanout: int = 2
+    arity: int = 2
+    class_depth: int = 2
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _params(arity: int) -> list[str]:
+    return [f"p{i}" for i in range(arity)]
+
+
+def _function(file_i: int, func_i: int, cfg: RepoConfig, rng: random.Random) -> str:
+    params = _params(cfg.arity)
+    lines = [f"def func_{file_i}_{func_i}({', '.join(params)}):"]
+    lines.append(f"    acc = [{', '.join(params)}]")
+    if file_i % LEVELS and cfg.functions:
+        callees = rng.sample(range(cfg.functions), min(cfg.fanout, cfg.functions))
+        for callee in callees:
+            lines.append(f"    acc.append(mod_{file_i - 1}.func_{file_i - 1}_{callee}({', '.join(params)}))")
+    lines.append("    return len(acc)")
+    return "\n".join(lines)
+
+
+def _classes(file_i: int, cfg: RepoConfig) -> str:
+    args = ", ".join(_params(cfg.arity))
+    first = f"func_{file_i}_0({args})" if cfg.functions else "None"
+    out = []
+    for depth in range(cfg.class_depth):
+        if depth:
+            lines = [f"class Node_{file_i}_{depth}(Node_{file_i}_{depth - 1}):"]
+        else:
+            lines = [
+                f"class Node_{file_i}_0:",
+                "    def __init__(self, value=None):",
+                "        self.value = value",
+                "",
+            ]
+        lines += [
+            f"    def method_{depth}({', '.join(['self', *_params(cfg.arity)])}):",
+            f"        self.value = [{args}]",
+            f"        return {first}",
+        ]
+        out.append("\n".join(lines))
+    return "\n\n\n".join(out)
+
+
+def module_source(file_i: int, cfg: RepoConfig, rng: random.Random) -> str:
+    header = f'"""Synthetic module {file_i}."""\n'
+    if file_i % LEVELS:
+        header += f"from synth import mod_{file_i - 1}\n"
+    parts = [header.rstrip("\n")]
+    parts += [_function(file_i, j, cfg, rng) for j in range(cfg.functions)]
+    if cfg.class_depth:
+        parts.append(_classes(file_i, cfg))
+    return "\n\n\n".join(parts) + "\n"
+
+
+def generate_repo(root: str, cfg: RepoConfig) -> str:
+    """Write the repository under `root`. Returns the package directory."""
+    rng = random.Random(cfg.seed)
+    pkg = os.path.join(root, "synth")
+    os.makedirs(pkg, exist_ok=True)
+    with open(os.path.join(pkg, "__init__.py"), "w", encoding="utf-8") as f:
+        f.write('"""Synthetic benchmark package."""\n')
+    for i in range(cfg.files):
+        with open(os.path.join(pkg, f"mod_{i}.py"), "w", encoding="utf-8") as f:
+            f.write(module_source(i, cfg, rng))
+    return pkg
+
+
+def add_config_arguments(ap: argparse.ArgumentParser) -> None:
+    defaults = RepoConfig()
+    ap.add_argument("--files", type=int, default=defaults.files)
+    ap.add_argument("--functions", type=int, default=defaults.functions, help="functions per file")
+    ap.add_argument("--fanout", type=int, default=defaults.fanout, help="calls per function")
+    ap.add_argument("--arity", type=int, default=defaults.arity, help="parameters per function")
+    ap.add_argument("--class-depth", type=int, default=defaults.class_depth, help="inheritance depth of each file's classes")
+    ap.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args) -> RepoConfig:
+    return RepoConfig(args.files, args.functions, args.fanout, args.arity, args.class_depth, args.seed)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("out_dir")
+    add_config_arguments(ap)
+    args = ap.parse_args()
+    print(generate_repo(args.out_dir, config_from_args(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Side-by-side overhead of the soe.run tracing backends.
+
+    python benchmarks/tracer_overhead.py [--repeat N]
+
+Runs the same workload untraced, under the settrace backend and (on Python
+3.12+) under the sys.monitoring backend, and reports the slowdown of each.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import soe.run as soe_run  # noqa: E402
+
+
+def _helper(x, scale):
+    total = 0
+    for i in range(x):
+        total += i * scale
+    return total
+
+
+def workload(n=2000):
+    """Loop-heavy code with nested calls, a typical worst case for tracers."""
+    acc = []
+    for i in range(n):
+        value = _helper(i % 50, 2)
+        pair = (value, str(value))
+        acc.append(pair)
+    return len(acc)
+
+
+def _reset_samples():
+    soe_run.type_list.clear()
+    soe_run._type_seen.clear()
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        _reset_samples()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    target = f"{__name__}.workload"
+    backends = ["settrace"] + (["monitoring"] if soe_run.has_monitoring() else [])
+
+    baseline = _time(workload, args.repeat)
+    print(f"Python {sys.version.split()[0]}")
+    print(f"{'untraced':<12} {baseline * 1000:9.2f} ms")
+
+    timings = {b: _time(lambda: soe_run.run(target, backend=b), args.repeat) for b in backends}
+
+    for backend, elapsed in timings.items():
+        print(f"{backend:<12} {elapsed * 1000:9.2f} ms  ({elapsed / baseline:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
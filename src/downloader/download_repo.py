@@ -1,9 +1,13 @@
 import git
-import os
 import json
-from pathlib import Path
 import shutil
+import hashlib
+from pathlib import Path
 import argparse
+import threading
+import contextlib
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import logging
 
 
@@ -23,68 +27,274 @@ with open(REPOS_DIR / "excepy_repo.json", "r") as f:
 
 # Directory to clone repositories into
 DOWNLOADS_DIR = Path("downloads")
+# Bare mirrors, one per upstream URL, shared by the checkouts of its projects
+MIRRORS_DIR_NAME = ".mirrors"
+# Refs keeping the single commits fetched into lean mirrors
+LEAN_REF_PREFIX = "refs/commits/"
+# Refs mirrored from upstreams: not `refs/*`, which on GitHub includes
+# every pull request head and merge
+MIRROR_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
 
 
-def clone_and_checkout(project, info):
-    repo_url = info['git_url']
-    commit_id = info['commit_id']
+def repo_name_from_url(repo_url: str) -> str:
+    return repo_url.rstrip("/").split("/")[-1].replace(".git", "")
 
-    # repository name and directory
-    repo_name = repo_url.split("/")[-1].replace(".git", "")
-    repo_dir = DOWNLOADS_DIR / repo_name
 
-    # Clone the repository if it doesn't exist
-    if not os.path.exists(repo_dir):
-        logger.info(f"Cloning {repo_name}...")
-        repo = git.Repo.clone_from(repo_url, repo_dir)
-    else:
-        logger.info(f"Repository {repo_name} already exists. Skipping clone.")
-        repo = git.Repo(repo_dir)
-
-    # Copy the repository to the project name
-    new_repo_dir = DOWNLOADS_DIR / project
-    if not os.path.exists(new_repo_dir):
-        logger.info(f"Copying {repo_name} to {project}...")
-        shutil.copytree(repo_dir, new_repo_dir)
-    else:
-        logger.info(f"Project {project} already exists. Skipping copy.")
+def mirror_path(repo_url: str, downloads_dir: Path, lean: bool = False) -> Path:
+    # Forks share a repository name, the URL hash keeps their mirrors apart
+    digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:8]
+    suffix = "-lean" if lean else ""
+    return downloads_dir / MIRRORS_DIR_NAME / f"{repo_name_from_url(repo_url)}-{digest}{suffix}.git"
+
+
+def has_commit(repo: git.Repo, commit_id: str) -> bool:
+    try:
+        repo.git.cat_file("-e", f"{commit_id}^{{commit}}")
+        return True
+    except git.GitCommandError:
+        return False
+
+
+def fetch_commit(mirror: git.Repo, commit_id: str) -> None:
+    """
+    Fetch `commit_id` alone, without history, into a lean mirror. Servers
+    that refuse it (no shallow fetches, no fetching by object id) get a
+    partial clone of every branch and tag instead: commits and trees, blobs
+    are fetched lazily by the checkout. Raises ValueError if `commit_id` is
+    still missing then.
+    """
+    try:
+        mirror.git.fetch("--depth", "1", "origin", f"{commit_id}:{LEAN_REF_PREFIX}{commit_id}")
+    except git.GitCommandError as e:
+        logger.info(f"Fetching {commit_id} alone failed ({_describe(e)}), falling back to a partial clone...")
+        # History older than earlier shallow fetches would stay cut off
+        shallow = mirror.git.rev_parse("--is-shallow-repository") == "true"
+        mirror.git.fetch("--filter=blob:none", *(["--unshallow"] if shallow else []), "origin", *MIRROR_REFSPECS)
+        if not has_commit(mirror, commit_id):
+            raise ValueError(f"Commit {commit_id} is not on any branch or tag of {mirror.remotes.origin.url}")
+
+
+def _set_refspecs(mirror: git.Repo) -> None:
+    with mirror.config_writer() as config:
+        config.set_value('remote "origin"', "fetch", MIRROR_REFSPECS[0])
+        config.add_value('remote "origin"', "fetch", MIRROR_REFSPECS[1])
 
-    # Checkout the commit
-    logger.info(f"Checking out commit {commit_id}...")
-    repo = git.Repo(new_repo_dir)
-    repo.git.checkout(commit_id, force=True)
 
+def ensure_mirror(repo_url: str, downloads_dir: Path, commit_ids: Iterable[str] = (), lean: bool = False) -> git.Repo:
+    """
+    Bare mirror of `repo_url`, cloned on first use. An existing mirror is
+    only fetched again when it lacks one of `commit_ids`.
 
-def download_repo(project: str):
+    :param lean: start from an empty repository and fetch only `commit_ids`
+        (see `fetch_commit`) instead of mirroring the whole history
+    """
+    path = mirror_path(repo_url, downloads_dir, lean)
+    if lean:
+        if path.exists():
+            mirror = git.Repo(path)
+        else:
+            logger.info(f"Initializing lean mirror of {repo_url}...")
+            mirror = git.Repo.init(path, bare=True, mkdir=True)
+            mirror.create_remote("origin", repo_url)
+        for commit_id in commit_ids:
+            if not has_commit(mirror, commit_id):
+                logger.info(f"Fetching {commit_id} from {repo_url}...")
+                fetch_commit(mirror, commit_id)
+        return mirror
+
+    if not path.exists():
+        logger.info(f"Mirroring {repo_url}...")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        mirror = git.Repo.clone_from(repo_url, path, bare=True)
+        # A bare clone has no fetch refspec, later fetches need one
+        _set_refspecs(mirror)
+        return mirror
+
+    mirror = git.Repo(path)
+    if any(not has_commit(mirror, c) for c in commit_ids):
+        logger.info(f"Fetching {repo_url} into {path.name}...")
+        _set_refspecs(mirror)
+        mirror.git.fetch("origin", "--prune")
+    return mirror
+
+
+def _belongs_to(project_dir: Path, mirror: git.Repo) -> bool:
+    try:
+        common_dir = git.Repo(project_dir).common_dir
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        return False
+    return Path(common_dir).resolve() == Path(mirror.git_dir).resolve()
+
+
+def add_worktree(
+        mirror: git.Repo,
+        project_dir: Path,
+        commit_id: str,
+        prune: bool = True,
+        lock: contextlib.AbstractContextManager | None = None
+    ) -> git.Repo:
+    """
+    Check `commit_id` out at `project_dir` as a detached worktree of
+    `mirror`: only the working tree is written, objects stay in the mirror.
+    An existing checkout of `mirror` is moved to `commit_id` in place, any
+    other directory (a checkout of another mirror or upstream, a plain
+    clone) is replaced.
+
+    :param prune: drop stale worktree entries first; bulk downloads prune
+        once per mirror instead, before adding worktrees concurrently
+    :param lock: held while registering the worktree in `mirror`, for
+        concurrent adds to one mirror; the checkout itself runs unlocked
+    """
+    if project_dir.exists():
+        if _belongs_to(project_dir, mirror):
+            logger.info(f"{project_dir.name} already exists. Checking out {commit_id}...")
+            repo = git.Repo(project_dir)
+            repo.git.checkout(commit_id, force=True)
+            return repo
+        # Its own repository may not have the commit; the stale worktree
+        # entry it leaves in another mirror is pruned later
+        logger.info(f"{project_dir.name} is not a checkout of {Path(mirror.git_dir).name}, replacing it...")
+        shutil.rmtree(project_dir)
+
+    # Worktrees whose directory was deleted would block the name
+    if prune:
+        mirror.git.worktree("prune")
+    logger.info(f"Adding worktree {project_dir.name} at {commit_id}...")
+    # git reads every worktree entry of the mirror while adding one, so
+    # concurrent adds would see each other's half-written entries
+    with lock or contextlib.nullcontext():
+        mirror.git.worktree("add", "--detach", "--force", "--no-checkout", str(project_dir.resolve()), commit_id)
+    repo = git.Repo(project_dir)
+    repo.git.reset("--hard")
+    return repo
+
+
+def clone_and_checkout(project, info, downloads_dir: Path | None = None, lean: bool = False):
+    """
+    Check the commit of `project` out at downloads/<project>, from the
+    mirror of its upstream (a lean mirror, with only the commits needed,
+    when `lean`).
+    """
+    downloads_dir = Path(downloads_dir or DOWNLOADS_DIR)
+    repo_url = info['git_url']
+    commit_id = info['commit_id']
+
+    mirror = ensure_mirror(repo_url, downloads_dir, [commit_id], lean)
+    return add_worktree(mirror, downloads_dir / project, commit_id)
+
+
+def download_repo(project: str, lean: bool = False):
     if project in typebugs_repo:
-        clone_and_checkout(project, typebugs_repo[project])
+        clone_and_checkout(project, typebugs_repo[project], lean=lean)
     elif project in bugsinpy_repo:
-        clone_and_checkout(project, bugsinpy_repo[project])
+        clone_and_checkout(project, bugsinpy_repo[project], lean=lean)
     elif project in excepy_repo:
-        clone_and_checkout(project, excepy_repo[project])
+        clone_and_checkout(project, excepy_repo[project], lean=lean)
     else:
         logger.info(f"Project {project} not found in any repository list.")
 
 
-def download_all():
-    logger.info("Downloading all projects...")
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--project", type=str, default=None)
-    args = ap.parse_args()
-    target = args.project
-
-    for project, info in typebugs_repo.items():
-        if target and target not in project:
-            continue
-        clone_and_checkout(project, info)
-    for project, info in bugsinpy_repo.items():
-        if target and target not in project:
-            continue
-        clone_and_checkout(project, info)
-    for project, info in excepy_repo.items():
-        if target and target not in project:
-            continue
-        clone_and_checkout(project, info)
+def all_projects(match: str | None = None) -> dict[str, dict]:
+    """Every project of the TypeBugs, BugsInPy and ExcePy lists (first list wins), optionally filtered by name."""
+    projects = {}
+    for repo_list in (typebugs_repo, bugsinpy_repo, excepy_repo):
+        for project, info in repo_list.items():
+            if match and match not in project:
+                continue
+            projects.setdefault(project, info)
+    return projects
+
+
+def group_by_url(projects: dict[str, dict]) -> dict[str, list[tuple[str, dict]]]:
+    groups = {}
+    for project, info in projects.items():
+        groups.setdefault(info['git_url'], []).append((project, info))
+    return groups
+
+
+def _describe(error: BaseException) -> str:
+    """One line describing a failed git operation."""
+    if isinstance(error, git.GitCommandError):
+        # GitPython wraps stderr as "\n  stderr: '...'"
+        stderr = str(error.stderr).strip().removeprefix("stderr: '").removesuffix("'")
+        lines = [line.strip() for line in stderr.splitlines() if line.strip()]
+        for line in lines:
+            if line.startswith(("fatal:", "error:")):
+                return line
+        if lines:
+            return lines[-1]
+    return str(error).strip() or type(error).__name__
+
+
+def download_all(
+        match: str | None = None,
+        jobs: int = 1,
+        downloads_dir: Path | None = None,
+        lean: bool = False
+    ) -> dict[str, str]:
+    """
+    Download every project (whose name contains `match`).
+
+    Projects are grouped by upstream URL: each mirror is fetched once, then
+    the checkouts of that mirror run in parallel. At most `jobs` git
+    operations run at a time. A failure does not stop the other projects.
+    With `lean`, mirrors only fetch the commits of their projects.
+
+    :return: {project: error} of the projects that failed
+    """
+    downloads_dir = Path(downloads_dir or DOWNLOADS_DIR)
+    groups = group_by_url(all_projects(match))
+    total = sum(len(members) for members in groups.values())
+    logger.info(f"Downloading {total} projects from {len(groups)} repositories with {jobs} jobs...")
+
+    failures: dict[str, str] = {}
+    done = 0
+
+    def finished(project, error=None):
+        nonlocal done
+        done += 1
+        if error is not None:
+            failures[project] = error
+            logger.error(f"[{done}/{total}] {project} failed: {error}")
+        else:
+            logger.info(f"[{done}/{total}] {project} done")
+
+    def mirror_task(url, members):
+        mirror = ensure_mirror(url, downloads_dir, [info['commit_id'] for _, info in members], lean)
+        mirror.git.worktree("prune")
+        return mirror
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as ex:
+        mirrors = {ex.submit(mirror_task, url, members): (url, members) for url, members in groups.items()}
+        checkouts = {}
+        while mirrors or checkouts:
+            completed, _ = wait([*mirrors, *checkouts], return_when=FIRST_COMPLETED)
+            for future in completed:
+                if future in checkouts:
+                    project = checkouts.pop(future)
+                    error = future.exception()
+                    finished(project, None if error is None else _describe(error))
+                    continue
+                url, members = mirrors.pop(future)
+                error = future.exception()
+                if error is not None:
+                    for project, _ in members:
+                        finished(project, f"mirroring {url} failed: {_describe(error)}")
+                    continue
+                lock = threading.Lock()
+                for project, info in members:
+                    checkout = ex.submit(
+                        add_worktree, future.result(), downloads_dir / project, info['commit_id'], False, lock
+                    )
+                    checkouts[checkout] = project
+
+    if failures:
+        logger.error(f"{len(failures)} of {total} projects failed:")
+        for project, error in sorted(failures.items()):
+            logger.error(f"  {project}: {error}")
+    else:
+        logger.info(f"All {total} projects downloaded")
+    return failures
 
 
 def list_projects():
@@ -98,4 +308,9 @@ def list_projects():
 
 
 if __name__ == "__main__":
-    download_all()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--project", type=str, default=None, help="only projects whose name contains this")
+    ap.add_argument("-j", "--jobs", type=int, default=1)
+    ap.add_argument("--lean", action="store_true", help="fetch only the needed commits, not whole histories")
+    args = ap.parse_args()
+    download_all(match=args.project, jobs=args.jobs, lean=args.lean)
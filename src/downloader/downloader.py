@@ -20,6 +20,17 @@ def main():
         action="store_true",
         help="download all projects"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="number of concurrent git operations when downloading all projects"
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="fetch only the commit each project needs instead of the whole history"
+    )
     parser.add_argument(
         "--no-log",
         action="store_true",
@@ -27,11 +38,15 @@ def main():
     )
 
     args = parser.parse_args()
-    downloader(
+    failures = downloader(
         install=args.install if args.install else "",
         all=args.all,
+        jobs=args.jobs,
+        lean=args.lean,
         no_log=args.no_log
     )
+    if failures:
+        sys.exit(1)
 
 
 def init_logger(level=logging.INFO, no_log=False) -> None:
@@ -56,8 +71,11 @@ def init_logger(level=logging.INFO, no_log=False) -> None:
 def downloader(
         install: str = "",
         all: bool = False,
+        jobs: int = 1,
+        lean: bool = False,
         no_log: bool = False
-    ):
+    ) -> dict[str, str]:
+    """Returns {project: error} of the projects that failed to download."""
     init_logger(no_log=no_log)
 
     import git as git
@@ -66,16 +84,18 @@ def downloader(
     except AssertionError:
         logger.error("Dependencies for downloader are not installed.")
         logger.error("Please run 'pip install -e \".[downloader]\" to install the required dependencies.")
-        return
+        return {}
 
+    failures = {}
     if all:
-        download_all()
+        failures = download_all(jobs=jobs, lean=lean)
     elif install:
-        download_repo(install)
+        download_repo(install, lean=lean)
     else:
         list_projects()
 
     logger.info("Exiting downloader")
+    return failures
 
 
 if __name__ == "__main__":
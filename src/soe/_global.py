@@ -1,60 +1,131 @@
-import threading
 import logging
+from soe.registry import ShardedRegistry
 
 logger = logging.getLogger('_global')
 
-type_list, function_list = {}, {}
-_f_lock = threading.Lock()
-_t_lock = threading.Lock()
+# Registries are never rebound, so modules may keep a reference to them
+# (run.type_list); setting a whole list swaps their contents instead
+type_list, function_list = ShardedRegistry(), ShardedRegistry()
+call_graph = None
+# Optional FunctionDB the function list accessors read and write through
+function_db = None
+# Parameter type counts not yet written to function_db, see flush_param_stats
+pending_stats = {}
 
 
 def init_global() -> None:
     logger.debug("Initializing global state")
+    set_function_db(None)
     set_function_list({})
     set_type_list({})
+    set_call_graph(None)
 
 # function_list
-def get_function_list() -> dict:
-    with _f_lock:
-        logger.debug("Getting function list")
-        return function_list
-    
+def _functions():
+    return function_db if function_db is not None else function_list
+
+def get_function_list() -> ShardedRegistry:
+    logger.debug("Getting function list")
+    return _functions()
+
 def get_function(f_name: str) -> dict:
-    with _f_lock:
-        logger.debug(f"Getting function {f_name}")
-        return function_list.get(f_name, {})
+    logger.debug("Getting function %s", f_name)
+    return _functions().get(f_name, {})
 
 def set_function_list(f_list: dict) -> None:
-    with _f_lock:
-        logger.debug(f"Setting function list {f_list}")
-        function_list = f_list
+    logger.debug("Setting function list (%d functions)", len(f_list))
+    if f_list is not function_list:
+        function_list.replace(f_list)
 
 def set_function(f_name: str, f_info: dict) -> None:
-    with _f_lock:
-        logger.debug(f"Setting function {f_name} with {f_info}")
-        function_list.update({f_name: f_info})
+    logger.debug("Setting function %s", f_name)
+    _functions()[f_name] = f_info
+
+def _add_counts(f_info: dict, counts: dict) -> dict:
+    # A new record, so snapshots taken before keep the old counts
+    params = {p: dict(c) for p, c in f_info.get("params", {}).items()}
+    for (param, t_name), count in counts.items():
+        p_counts = params.setdefault(param, {})
+        p_counts[t_name] = p_counts.get(t_name, 0) + count
+    return {**f_info, "params": params}
+
+def add_param_stats(stats: dict) -> None:
+    """Add observed parameter types, {(function, param, type): count}, to the function records."""
+    logger.debug("Adding %d parameter type counts", len(stats))
+    if function_db is not None:
+        for key, count in stats.items():
+            pending_stats[key] = pending_stats.get(key, 0) + count
+        return
+    per_function = {}
+    for (f_name, param, t_name), count in stats.items():
+        per_function.setdefault(f_name, {})[(param, t_name)] = count
+    for f_name, counts in per_function.items():
+        function_list.apply(f_name, lambda f_info: _add_counts(f_info, counts))
+
+def take_param_stats() -> dict:
+    """Counts added since the last flush, no longer pending."""
+    stats = dict(pending_stats)
+    pending_stats.clear()
+    return stats
+
+def flush_param_stats() -> None:
+    """
+    Write the pending counts to the function database. Runs at checkpoints,
+    so the database never holds counts of functions a resume runs again.
+    """
+    stats = take_param_stats()
+    if function_db is not None and stats:
+        logger.debug("Flushing %d parameter type counts", len(stats))
+        function_db.add_param_stats(stats)
+
+def functions_accepting(t_name: str) -> list[str]:
+    """Functions with a parameter that was seen taking type `t_name`."""
+    if function_db is not None:
+        return function_db.functions_accepting(t_name)
+    return [
+        f_name for f_name, f_info in function_list.items()
+        if any(counts.get(t_name) for counts in f_info.get("params", {}).values())
+    ]
+
+# function_db
+def get_function_db():
+    return function_db
+
+def set_function_db(db) -> None:
+    global function_db
+    logger.debug("Setting function database %s", getattr(db, "path", None))
+    function_db = db
+    pending_stats.clear()
 
 
 # type_list
-def get_type_list() -> dict:
-    with _t_lock:
-        logger.debug("Getting type list")
-        return type_list
-    
+def get_type_list() -> ShardedRegistry:
+    logger.debug("Getting type list")
+    return type_list
+
 def get_type(t_name: str) -> dict:
-    with _t_lock:
-        logger.debug(f"Getting type {t_name}")
-        return type_list.get(t_name, {})
-    
+    logger.debug("Getting type %s", t_name)
+    return type_list.get(t_name, {})
+
 def set_type_list(t_list: dict) -> None:
-    with _t_lock:
-        logger.debug(f"Setting type list {t_list}")
-        type_list = t_list
+    logger.debug("Setting type list (%d types)", len(t_list))
+    if t_list is not type_list:
+        type_list.replace(t_list)
 
 def set_type(t_name: str, t_info: dict) -> None:
-    with _t_lock:
-        logger.debug(f"Setting type {t_name} with {t_info}")
-        type_list.update({t_name: t_info})
+    logger.debug("Setting type %s", t_name)
+    type_list[t_name] = t_info
+
+
+# call_graph
+def get_call_graph():
+    logger.debug("Getting call graph")
+    return call_graph
+
+def set_call_graph(graph) -> None:
+    global call_graph
+    logger.debug("Setting call graph")
+    call_graph = graph
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import pickle
+import logging
+from pathlib import Path
+from typing import Any, Callable
+from soe import profiling
+
+logger = logging.getLogger('checkpoint')
+
+
+CHECKPOINT_FILE = "checkpoint.json"
+DEFAULT_INTERVAL = 60.0
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write `data` to a temp file next to `path`, fsync it, then rename it over `path`."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def atomic_pickle(path: Path, obj: Any) -> None:
+    atomic_write(path, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class Checkpoint:
+    """
+    Progress of a fuzz campaign: the set of targets already processed,
+    saved to `checkpoint.json` in `output_dir` at most every `interval`
+    seconds (and on `save`).
+
+    Before the done-set is written, every registered `before_save` hook
+    runs (flushing sample stores and logs, snapshotting function stats), so
+    the checkpoint never claims work whose results are not on disk yet.
+    Every file is replaced atomically; a crash leaves the previous
+    checkpoint intact.
+    """
+
+    def __init__(self, output_dir: Path, interval: float = DEFAULT_INTERVAL, resume: bool = False):
+        self.path = Path(output_dir) / CHECKPOINT_FILE
+        self.interval = interval
+        self.done: set[str] = set()
+        self.hooks: list[Callable[[], None]] = []
+        self._last_save = time.monotonic()
+        self._dirty = False
+
+        if resume:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.done = set(json.load(f).get("done", ()))
+                logger.info(f"Resuming from {self.path}, {len(self.done)} targets already done")
+            except (OSError, ValueError) as e:
+                logger.warning(f"No usable checkpoint at {self.path} ({e}), starting over")
+
+    def before_save(self, hook: Callable[[], None]) -> None:
+        self.hooks.append(hook)
+
+    def is_done(self, target: str) -> bool:
+        return target in self.done
+
+    def mark_done(self, target: str) -> None:
+        self.done.add(target)
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        with profiling.phase("checkpoint.save"):
+            for hook in self.hooks:
+                hook()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.path, json.dumps({"done": sorted(self.done), "saved_at": time.time()}).encode("utf-8"))
+        self._last_save = time.monotonic()
+        self._dirty = False
+        logger.debug(f"Checkpoint saved ({len(self.done)} targets done)")
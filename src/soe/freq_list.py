@@ -2,12 +2,20 @@ import inspect
 import random
 import sys
 import os
-import json
 import importlib
 import multiprocessing
 import ast
 import textwrap
+import argparse
+import re
+import linecache
+import itertools
 from collections import defaultdict
+from soe.worker_pool import WorkerPool
+from soe.zygote import ZygotePool, has_fork
+from soe.result_log import ResultLog, compact
+from soe.scheduler import AdaptiveTimeouts, CampaignBudget, DEFAULT_TIMEOUT, parse_duration
+from soe.function_list.repo_walker import IGNORE_DIRS
 
 # --- 1. Top-Level Definitions (Picklable) ---
 
@@ -82,19 +90,326 @@ def analyze_live_function(func_obj):
     except Exception:
         return -1, []
 
-# --- 3. The Worker Task ---
+# --- 3. Coverage-Guided Type Search ---
 
-def worker_fuzz_task(sys_path_root, module_name, class_name, func_name, iterations, result_queue):
+# Consecutive executions without new coverage before a target is considered done
+COVERAGE_PATIENCE = 16
+# Chance of drawing a fresh random combination instead of mutating the corpus
+FRESH_RATE = 0.2
+
+# Root of the repository under test; only its code is measured
+_coverage_root = None
+
+class CoverageCollector:
     """
-    Worker now receives 'sys_path_root' explicitly to ensure it can import correctly.
+    Cheap arc coverage of repository code: a set of (code, from line,
+    to line) transitions, collected with `sys.settrace`, plus the
+    instruction and type of the exception a call ended with. Frames of
+    code outside `root` (stdlib, site-packages) are not traced at all.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.normcase(os.path.abspath(root)) + os.sep
+        self.arcs = set()
+        self._in_root = {}  # code -> bool
+
+    def _global_trace(self, frame, event, arg):
+        code = frame.f_code
+        inside = self._in_root.get(code)
+        if inside is None:
+            inside = self._in_root[code] = os.path.normcase(os.path.abspath(code.co_filename)).startswith(self.root)
+        if not inside:
+            return None
+
+        arcs = self.arcs
+        prev = -code.co_firstlineno
+
+        def local_trace(frame, event, arg):
+            nonlocal prev
+            if event == "line":
+                line = frame.f_lineno
+                arcs.add((code, prev, line))
+                prev = line
+            elif event == "return" or event == "exception":
+                arcs.add((code, prev, event))
+            return local_trace
+        return local_trace
+
+    def run(self, fn, *args):
+        """Call `fn(*args)` under coverage. Returns (new arcs, exception or None)."""
+        before = len(self.arcs)
+        old = sys.gettrace()
+        sys.settrace(self._global_trace)
+        try:
+            fn(*args)
+            exc = None
+        except Exception as e:
+            exc = e
+        finally:
+            sys.settrace(old)
+        if exc is not None:
+            # The failing instruction tells apart errors raised on one line
+            tb = exc.__traceback__
+            while tb.tb_next is not None:
+                tb = tb.tb_next
+            self.arcs.add((tb.tb_frame.f_code, tb.tb_lasti, type(exc)))
+        return len(self.arcs) - before, exc
+
+def fuzz_coverage_guided(target_func, names, gen, max_execs):
+    """
+    Search type combinations for `target_func` guided by coverage. Every
+    combination that reached new code, or made a parameter accept a new
+    type, joins the corpus; new candidates are
+    mostly single-parameter mutations of corpus entries. Stops after
+    `max_execs` executions, once every combination was tried, or after
+    `COVERAGE_PATIENCE` executions without new coverage.
+
+    :return: type assignments of the executions that did not raise
+    """
+    collector = CoverageCollector(_coverage_root or os.getcwd())
+    universe = gen.universe
+    n_combos = len(universe) ** len(names)
+    limit = min(max_execs, n_combos)
+    corpus, good, tried, successes = [], [], set(), []
+    accepted = set()  # (name, type) pairs seen in a successful execution
+    stale = draws = 0
+
+    # Repeated draws of tried combinations cost no execution, only bound them
+    while len(tried) < limit and stale < COVERAGE_PATIENCE and draws < 10 * limit:
+        draws += 1
+        if corpus and random.random() >= FRESH_RATE:
+            # Neighbours of combinations that ran through are the likeliest to run too
+            pool = good if good and random.random() < 0.5 else corpus
+            combo = list(random.choice(pool))
+            if combo:
+                combo[random.randrange(len(combo))] = gen.get_random_type()
+            combo = tuple(combo)
+        else:
+            combo = tuple(gen.get_random_type() for _ in names)
+        if combo in tried:
+            continue
+        tried.add(combo)
+
+        new_arcs, exc = collector.run(target_func, *[gen.generate_value(t) for t in combo])
+        new_types = 0
+        if exc is None:
+            successes.append({name: t.__name__ for name, t in zip(names, combo)})
+            # A parameter accepting a new type is progress even on known code
+            for pair in zip(names, combo):
+                if pair not in accepted:
+                    accepted.add(pair)
+                    new_types += 1
+        if new_arcs or new_types:
+            corpus.append(combo)
+            if exc is None:
+                good.append(combo)
+            stale = 0
+        else:
+            stale += 1
+
+    return successes
+
+# Blamed failures without any success before a type is dropped for a parameter
+PRUNE_AFTER = 3
+
+_QUOTED = re.compile(r"'([A-Za-z_][\w.]*)'")
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+
+class TypeBandit:
+    """
+    Per-parameter multi-armed bandit over the type universe.
+
+    Every parameter keeps success/failure counts per type. Each draw focuses
+    on the parameter with the most open (not yet confirmed, not pruned)
+    types and picks one of those by Thompson sampling (Beta(successes + 1,
+    failures + 1)); the other parameters exploit the same way over all their
+    remaining types, which favours types known to work. Failures are charged
+    to the parameters `blame` points at; a type that collected `PRUNE_AFTER`
+    blamed failures and never worked is dropped.
+    """
+
+    def __init__(self, names, universe):
+        self.names = list(names)
+        self.arms = {name: list(universe) for name in self.names}
+        # name -> type -> [successes, failures]
+        self.stats = {name: {t: [0, 0.0] for t in universe} for name in self.names}
+
+    def open_arms(self, name):
+        return [t for t in self.arms[name] if self.stats[name][t][0] == 0]
+
+    def draw(self):
+        """Next combination, or None once every type of every parameter is settled."""
+        open_counts = {name: len(self.open_arms(name)) for name in self.names}
+        if not any(open_counts.values()):
+            return None
+        most = max(open_counts.values())
+        focus = random.choice([name for name, n in open_counts.items() if n == most])
+
+        combo = []
+        for name in self.names:
+            stats = self.stats[name]
+            arms = self.open_arms(name) if name == focus else self.arms[name]
+            combo.append(max(arms, key=lambda t: random.betavariate(stats[t][0] + 1, stats[t][1] + 1)))
+        return tuple(combo)
+
+    def blame(self, combo, exc, code):
+        """
+        Names of the parameters most likely responsible for `exc`: those (or
+        whose type) the exception message quotes, else those used on the line
+        of the target function the exception went through, else all of them.
+        """
+        quoted = set(_QUOTED.findall(str(exc)))
+        blamed = [n for n, t in zip(self.names, combo) if n in quoted or t.__name__ in quoted]
+        if blamed:
+            return blamed
+
+        tb = exc.__traceback__
+        while tb is not None and tb.tb_frame.f_code is not code:
+            tb = tb.tb_next
+        if tb is not None:
+            used = set(_IDENTIFIER.findall(linecache.getline(code.co_filename, tb.tb_lineno)))
+            blamed = [n for n in self.names if n in used]
+            if blamed:
+                return blamed
+        return self.names
+
+    def update(self, combo, exc=None, code=None):
+        if exc is None:
+            for name, t in zip(self.names, combo):
+                self.stats[name][t][0] += 1
+            return
+
+        blamed = self.blame(combo, exc, code)
+        share = 1.0 / len(blamed)
+        for name, t in zip(self.names, combo):
+            if name not in blamed:
+                continue
+            stats = self.stats[name][t]
+            stats[1] += share
+            arms = self.arms[name]
+            if stats[0] == 0 and stats[1] >= PRUNE_AFTER and len(arms) > 1:
+                arms.remove(t)
+
+def fuzz_bandit(target_func, names, gen, iterations):
+    """
+    Fuzz `target_func` for at most `iterations` executions, drawing every
+    parameter's type from a `TypeBandit`. Stops early once nothing is left
+    to learn.
+
+    :return: type assignments of the executions that did not raise
+    """
+    bandit = TypeBandit(names, gen.universe)
+    code = getattr(getattr(target_func, "__func__", target_func), "__code__", None)
+    successes = []
+
+    for _ in range(iterations):
+        combo = bandit.draw()
+        if combo is None:
+            break
+        try:
+            target_func(*[gen.generate_value(t) for t in combo])
+        except Exception as e:
+            bandit.update(combo, e, code)
+        else:
+            bandit.update(combo)
+            successes.append({name: t.__name__ for name, t in zip(names, combo)})
+
+    return successes
+
+# Signatures with at most this many type combinations are enumerated exhaustively
+EXHAUSTIVE_LIMIT = 64
+
+def pairwise_array(n_params, n_values):
+    """
+    Pairwise covering array built with IPOG (in-parameter-order): rows of
+    value indices such that every pair of columns shows every pair of
+    values at least once. Deterministic; for n_values = v it has v * v
+    rows for up to three parameters and grows roughly with log(n_params)
+    after that, instead of v ** n_params.
+    """
+    if n_params <= 2:
+        return [list(r) for r in itertools.product(range(n_values), repeat=n_params)]
+
+    values = range(n_values)
+    rows = [list(r) for r in itertools.product(values, repeat=2)]
+    for k in range(2, n_params):
+        uncovered = {(j, a, b) for j in range(k) for a in values for b in values}
+
+        # Horizontal growth: extend every row with the value covering most new pairs
+        for row in rows:
+            best = max(values, key=lambda b: sum((j, row[j], b) in uncovered for j in range(k) if row[j] is not None))
+            row.append(best)
+            uncovered.difference_update((j, row[j], best) for j in range(k) if row[j] is not None)
+
+        # Vertical growth: new rows (with don't-care cells) for the pairs left
+        extra = []
+        for j, a, b in sorted(uncovered):
+            for row in extra:
+                if row[k] == b and row[j] is None:
+                    row[j] = a
+                    break
+            else:
+                row = [None] * (k + 1)
+                row[j], row[k] = a, b
+                extra.append(row)
+        rows.extend(extra)
+
+    return [[0 if v is None else v for v in row] for row in rows]
+
+def type_combinations(n_params, universe):
+    """
+    Every combination of `universe` types for `n_params` parameters, each
+    exactly once, while there are at most `EXHAUSTIVE_LIMIT`; a pairwise
+    covering array beyond that.
+    """
+    if len(universe) ** n_params <= EXHAUSTIVE_LIMIT:
+        return list(itertools.product(universe, repeat=n_params))
+    return [tuple(universe[i] for i in row) for row in pairwise_array(n_params, len(universe))]
+
+def fuzz_enumerate(target_func, names, gen):
     """
+    Run `target_func` once per row of `type_combinations`, in order.
+
+    :return: type assignments of the executions that did not raise
+    """
+    successes = []
+    for combo in type_combinations(len(names), gen.universe):
+        try:
+            target_func(*[gen.generate_value(t) for t in combo])
+        except Exception:
+            continue
+        successes.append({name: t.__name__ for name, t in zip(names, combo)})
+    return successes
+
+# --- 4. The Worker Task ---
+
+def init_fuzz_worker(sys_path_root):
+    """
+    One-time setup of a fuzz worker process: make the repository importable
+    and silence the output of the code under test.
+    """
+    global _coverage_root
     if sys_path_root not in sys.path:
         sys.path.insert(0, sys_path_root)
+    _coverage_root = sys_path_root
     
     # Silence output
     sys.stdout = open(os.devnull, 'w')
     sys.stderr = open(os.devnull, 'w')
 
+def fuzz_target(module_name, class_name, func_name, iterations, mode="random"):
+    """
+    Fuzz a single function or method and return the list of type assignments
+    that ran without raising. Returns None if the target cannot be loaded.
+
+    :param mode: "random" draws `iterations` independent combinations,
+        "coverage" runs `fuzz_coverage_guided` with at most `iterations`
+        executions, "bandit" runs `fuzz_bandit`, "enumerate" runs
+        `fuzz_enumerate` (which ignores `iterations`)
+
+    Imported modules stay cached in `sys.modules`, so a long-lived worker only
+    pays the import cost once per module.
+    """
     local_success_log = []
 
     try:
@@ -112,7 +427,7 @@ def worker_fuzz_task(sys_path_root, module_name, class_name, func_name, iteratio
                 try: 
                     # Try passing a list (common for vector-like classes)
                     instance = ConcreteCls([1,2])
-                except: return 
+                except: return None
             
             target_func = getattr(instance, func_name)
         else:
@@ -121,6 +436,15 @@ def worker_fuzz_task(sys_path_root, module_name, class_name, func_name, iteratio
         gen = FuzzGenerator()
         sig = inspect.signature(target_func)
         params = list(sig.parameters.values())
+
+        if mode in ("coverage", "bandit", "enumerate"):
+            names = [p.name for p in params
+                     if p.name not in ['self', 'cls'] and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)]
+            if mode == "bandit":
+                return fuzz_bandit(target_func, names, gen, iterations)
+            if mode == "enumerate":
+                return fuzz_enumerate(target_func, names, gen)
+            return fuzz_coverage_guided(target_func, names, gen, iterations)
         
         for _ in range(iterations):
             args = []
@@ -142,22 +466,42 @@ def worker_fuzz_task(sys_path_root, module_name, class_name, func_name, iteratio
                 # We expect crashes/exceptions during fuzzing, ignore them here
                 pass
 
-        result_queue.put(local_success_log)
+        return local_success_log
 
     except Exception:
         # If the worker cannot import or find the function, it dies silently
-        pass
+        return None
 
-# --- 4. The Safe Runner ---
+def worker_fuzz_task(sys_path_root, module_name, class_name, func_name, iterations, result_queue, mode="random"):
+    """
+    Worker now receives 'sys_path_root' explicitly to ensure it can import correctly.
+    """
+    init_fuzz_worker(sys_path_root)
+
+    local_success_log = fuzz_target(module_name, class_name, func_name, iterations, mode)
+    if local_success_log is not None:
+        result_queue.put(local_success_log)
+
+# --- 5. The Safe Runner ---
+
+def run_safely(sys_path_root, module_name, class_name, func_name, iterations=10, pool=None, timeout=DEFAULT_TIMEOUT, mode="random"):
+    """
+    Fuzz one target in isolation. With a `WorkerPool` the target runs on a
+    recycled worker, otherwise a fresh process is spawned for it.
+
+    :param timeout: seconds the target may run, see `AdaptiveTimeouts`
+    """
+    if pool is not None:
+        status, results, _ = pool.run(module_name, class_name, func_name, iterations, mode, timeout=timeout)
+        return status, results
 
-def run_safely(sys_path_root, module_name, class_name, func_name, iterations=10):
     queue = multiprocessing.Queue()
     p = multiprocessing.Process(
         target=worker_fuzz_task, 
-        args=(sys_path_root, module_name, class_name, func_name, iterations, queue)
+        args=(sys_path_root, module_name, class_name, func_name, iterations, queue, mode)
     )
     p.start()
-    p.join(timeout=0.5) 
+    p.join(timeout=timeout)
     
     if p.is_alive():
         p.terminate()
@@ -203,11 +547,35 @@ def update_stats(final_results, module_name, class_name, func_name, static_info,
                     param_stats[param] = defaultdict(int)
                 param_stats[param][type_name] += 1
 
-# --- 5. Main Logic ---
+def replay_result(final_results, record):
+    """Reducer for `compact`: apply one fuzz_results.jsonl record."""
+    update_stats(final_results, record["module"], record["class"], record["func"], record["static_info"], record["success"])
 
-def get_function_list(repo_root):
+def compact_fuzz_results(log_path="fuzz_results.jsonl", out_path="fuzz_results.json"):
+    """Build the final fuzz_results.json from the streaming log."""
+    return compact(log_path, out_path, replay_result, indent=4)
+
+# --- 6. Main Logic ---
+
+def get_function_list(repo_root, processes=None, budget=None, timings_file=None, mode="random", zygote=False):
+    """
+    Discover every function and method of the repository and fuzz them.
+
+    :param budget: wall-clock budget of the whole campaign in seconds (or a
+        duration such as "30m"), spread over the targets still waiting;
+        None means unlimited
+    :param timings_file: run times observed by earlier campaigns, used to
+        start the adaptive timeouts warm and updated at the end; None (the
+        default) keeps them in memory only
+    :param mode: "random", "coverage", "bandit" or "enumerate", see `fuzz_target`
+    :param zygote: fuzz every target in a fresh child forked from a template
+        process with all target modules pre-imported (`ZygotePool`), instead
+        of on long-lived pool workers
+    """
     iterations=20
     repo_root = os.path.abspath(repo_root)
+    if isinstance(budget, str):
+        budget = parse_duration(budget)
     
     is_package = os.path.exists(os.path.join(repo_root, "__init__.py"))
     
@@ -229,16 +597,11 @@ def get_function_list(repo_root):
     # Changed from nested dicts to a single flat dictionary
     final_results = {}
 
-    IGNORE_DIRS = {'tests', 'testing', 'benchmarks', 'examples', '_examples', 'conftest', 
-                   'cython', 'include', 'distutils', 'f2py', '.git', '__pycache__', 'venv', 'env'}
-
     modules_processed = 0
     crashes_detected = 0
 
-    class DefaultEncoder(json.JSONEncoder):
-        def default(self, obj):
-            if isinstance(obj, defaultdict): return dict(obj)
-            return super().default(obj)
+    # (module_string, cls_name, func_name, static_info)
+    all_targets = []
 
     for root, dirs, files in os.walk(repo_root):
         dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
@@ -286,38 +649,95 @@ def get_function_list(repo_root):
                         targets.append((None, f.__name__, f))
                 except: pass
 
-                # Fuzz Targets
+                # Metadata Extraction (using AST on the live object source)
                 for cls_name, func_name, func_obj in targets:
-                    
-                    # 1. Metadata Extraction (using AST on the live object source)
                     lineno, calls = analyze_live_function(func_obj)
                     static_info = {"lineno": lineno, "calls": calls}
-                    
-                    # 2. Fuzzing
-                    status, results = run_safely(sys_path_root, module_string, cls_name, func_name, iterations)
-                    
-                    if status == "SUCCESS":
-                        update_stats(final_results, module_string, cls_name, func_name, static_info, results)
-                    elif status == "CRASH":
-                        crashes_detected += 1
-                        # Save the function entry even if it crashed, so we know it exists
-                        update_stats(final_results, module_string, cls_name, func_name, static_info, [])
+                    all_targets.append((module_string, cls_name, func_name, static_info))
                 
                 modules_processed += 1
-                if modules_processed % 5 == 0:
-                    with open("fuzz_results.json", 'w') as f:
-                        json.dump(final_results, f, indent=4, cls=DefaultEncoder)
+
+    if zygote and not has_fork():
+        print("[!] os.fork is not available, falling back to pool workers")
+        zygote = False
+    if zygote:
+        # Imports are paid once in the template, every target still gets its own process
+        preload = sorted({module_string for module_string, _, _, _ in all_targets})
+        pool = ZygotePool(fuzz_target, initializer=init_fuzz_worker, initargs=(sys_path_root,),
+                          preload=preload, processes=processes)
+    else:
+        # Long-lived workers keep imported modules cached between targets
+        pool = WorkerPool(fuzz_target, initializer=init_fuzz_worker, initargs=(sys_path_root,), processes=processes)
+    timeouts = AdaptiveTimeouts()
+    if timings_file:
+        timeouts.load(timings_file)
+    campaign = CampaignBudget(budget, pool.processes)
+    # Per-target results are streamed, fuzz_results.json is built once at the end
+    log = ResultLog("fuzz_results.jsonl")
+
+    def fuzz_all(targets, retry):
+        """Fuzz `targets` in batches that keep every worker busy. Returns the targets that timed out."""
+        nonlocal crashes_detected
+        timed_out = []
+        step = 4 * pool.processes
+        for start in range(0, len(targets), step):
+            if campaign.exhausted():
+                print(f"\n[!] Budget exhausted, {len(targets) - start} targets skipped")
+                break
+            batch = targets[start:start + step]
+            pending = len(targets) - start
+            # A target that timed out before gets a larger timeout here
+            limits = [campaign.cap(timeouts.timeout_for(m, c, f), pending) for m, c, f, _ in batch]
+
+            tasks = [(module_string, cls_name, func_name, iterations, mode) for module_string, cls_name, func_name, _ in batch]
+            for target, (status, results, elapsed) in zip(batch, pool.map(tasks, timeouts=limits)):
+                module_string, cls_name, func_name, static_info = target
+                timeouts.observe(module_string, cls_name, func_name, status, elapsed)
+                if status == "TIMEOUT":
+                    if not retry:
+                        timed_out.append(target)
+                    continue
+                if status == "CRASH":
+                    crashes_detected += 1
+                    # Save the function entry even if it crashed, so we know it exists
+                    results = []
+                elif status != "SUCCESS":
+                    continue
+                update_stats(final_results, module_string, cls_name, func_name, static_info, results)
+                log.append({"module": module_string, "class": cls_name, "func": func_name,
+                            "static_info": static_info, "status": status, "success": results})
+        return timed_out
+
+    try:
+        timed_out = fuzz_all(all_targets, retry=False)
+        # One more chance for timed out targets, only with time left
+        if timed_out and not campaign.exhausted():
+            print(f"\n[*] Retrying {len(timed_out)} timed out targets with a larger budget")
+            timed_out = fuzz_all(timed_out, retry=True)
+    finally:
+        pool.close()
+        log.close()
+        if timings_file:
+            timeouts.save(timings_file)
 
     print(f"\n\n[*] Fuzzing complete.")
     print(f"[*] Total Crashes survived: {crashes_detected}")
     
-    with open("fuzz_results.json", 'w') as f:
-         json.dump(final_results, f, indent=4, cls=DefaultEncoder)
+    compact_fuzz_results()
 
     return final_results
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python fuzzer9.py <repo_root>")
-    else:
-        results_dict = get_function_list(sys.argv[1])
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fuzz every function of a repository")
+    parser.add_argument("repo_root")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--budget", default=None, help="time budget of the whole campaign, e.g. 30m")
+    parser.add_argument("--mode", choices=["random", "coverage", "bandit", "enumerate"], default="random",
+                        help="how type combinations are chosen")
+    parser.add_argument("--zygote", action="store_true",
+                        help="fork every target from a pre-imported template process")
+    parser.add_argument("--timings-file", default=None,
+                        help="load and save observed run times here, to start later campaigns with warm timeouts")
+    args = parser.parse_args()
+    results_dict = get_function_list(args.repo_root, processes=args.jobs, budget=args.budget, mode=args.mode,
+                                     zygote=args.zygote, timings_file=args.timings_file)
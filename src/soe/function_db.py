@@ -0,0 +1,267 @@
+import os
+import json
+import sqlite3
+import logging
+from array import array
+from collections.abc import Iterable, Iterator, MutableMapping
+from pathlib import Path
+
+logger = logging.getLogger('function_db')
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS functions (
+    id INTEGER PRIMARY KEY,
+    qualname TEXT NOT NULL UNIQUE,
+    module TEXT NOT NULL,
+    filename TEXT,
+    lineno INTEGER,
+    node INTEGER,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS functions_module ON functions(module);
+
+CREATE TABLE IF NOT EXISTS params (
+    id INTEGER PRIMARY KEY,
+    function_id INTEGER NOT NULL REFERENCES functions(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    UNIQUE (function_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS param_types (
+    param_id INTEGER NOT NULL REFERENCES params(id) ON DELETE CASCADE,
+    type_name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (param_id, type_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS param_types_type ON param_types(type_name);
+
+CREATE TABLE IF NOT EXISTS call_edges (
+    caller TEXT NOT NULL,
+    callee TEXT NOT NULL,
+    PRIMARY KEY (caller, callee)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS call_edges_callee ON call_edges(callee);
+"""
+
+# Record keys with their own columns, everything else goes to `extra`
+_COLUMNS = ("filename", "lineno", "node")
+
+
+class FunctionDB(MutableMapping):
+    """
+    SQLite (WAL mode) store of the function list: functions, their params,
+    per-param type counts and call edges, indexed by module, qualname and
+    type name.
+
+    As a mapping it behaves like the function list dict (qualname ->
+    {"params": {param: {type: count}}, "filename", "lineno", "node"}), so it
+    can sit behind the `_global` accessors; records are read from the
+    database on access instead of being loaded whole. Every process opens
+    its own connection, and stat updates are upserts, so several workers
+    can add to the same database concurrently.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._conn = None
+        self._pid = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # sqlite connections must not cross fork()
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __getstate__(self):
+        return {"path": self.path, "timeout": self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["timeout"])
+
+    def _write(self):
+        """Context manager of one write transaction (taken eagerly to avoid upgrade deadlocks)."""
+        conn = self.conn
+        return _Transaction(conn)
+
+    # --- writing ---
+
+    def _upsert(self, conn: sqlite3.Connection, qualname: str, info: dict) -> None:
+        extra = {k: v for k, v in info.items() if k not in _COLUMNS and k != "params"}
+        module = info.get("module") or qualname.rsplit(".", 1)[0]
+        conn.execute(
+            "INSERT INTO functions (qualname, module, filename, lineno, node, extra) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(qualname) DO UPDATE SET module=excluded.module, filename=excluded.filename, "
+            "lineno=excluded.lineno, node=excluded.node, extra=excluded.extra",
+            (qualname, module, info.get("filename"), info.get("lineno"), info.get("node"),
+             json.dumps(extra) if extra else None)
+        )
+        fid = conn.execute("SELECT id FROM functions WHERE qualname = ?", (qualname,)).fetchone()[0]
+        params = info.get("params", {})
+        conn.execute(
+            f"DELETE FROM params WHERE function_id = ? AND name NOT IN ({','.join('?' * len(params))})",
+            (fid, *params)
+        )
+        for position, (name, counts) in enumerate(params.items()):
+            conn.execute(
+                "INSERT INTO params (function_id, name, position) VALUES (?, ?, ?) "
+                "ON CONFLICT(function_id, name) DO UPDATE SET position=excluded.position",
+                (fid, name, position)
+            )
+            pid = conn.execute("SELECT id FROM params WHERE function_id = ? AND name = ?", (fid, name)).fetchone()[0]
+            conn.execute("DELETE FROM param_types WHERE param_id = ?", (pid,))
+            conn.executemany(
+                "INSERT INTO param_types (param_id, type_name, count) VALUES (?, ?, ?)",
+                [(pid, t, c) for t, c in (counts or {}).items()]
+            )
+
+    def __setitem__(self, qualname: str, info: dict) -> None:
+        with self._write() as conn:
+            self._upsert(conn, qualname, info)
+
+    def update_many(self, records: dict) -> None:
+        """Upsert many records in one transaction."""
+        with self._write() as conn:
+            for qualname, info in records.items():
+                self._upsert(conn, qualname, info)
+
+    def replace_all(self, records: dict) -> None:
+        """Make the database hold exactly `records`."""
+        with self._write() as conn:
+            conn.execute("DELETE FROM functions")
+            for qualname, info in records.items():
+                self._upsert(conn, qualname, info)
+
+    def __delitem__(self, qualname: str) -> None:
+        with self._write() as conn:
+            if conn.execute("DELETE FROM functions WHERE qualname = ?", (qualname,)).rowcount == 0:
+                raise KeyError(qualname)
+
+    def add_param_stats(self, stats: dict[tuple[str, str, str], int]) -> None:
+        """
+        Add observed type counts, {(qualname, param, type_name): count}, in
+        one transaction. Params of known functions are created as needed.
+        """
+        if not stats:
+            return
+        with self._write() as conn:
+            for (qualname, param, type_name), count in stats.items():
+                row = conn.execute("SELECT id FROM functions WHERE qualname = ?", (qualname,)).fetchone()
+                if row is None:
+                    continue
+                conn.execute(
+                    "INSERT INTO params (function_id, name, position) "
+                    "SELECT ?, ?, COALESCE(MAX(position) + 1, 0) FROM params WHERE function_id = ? "
+                    "ON CONFLICT(function_id, name) DO NOTHING",
+                    (row[0], param, row[0])
+                )
+                conn.execute(
+                    "INSERT INTO param_types (param_id, type_name, count) "
+                    "SELECT id, ?, ? FROM params WHERE function_id = ? AND name = ? "
+                    "ON CONFLICT(param_id, type_name) DO UPDATE SET count = count + excluded.count",
+                    (type_name, count, row[0], param)
+                )
+
+    def set_call_edges(self, edges: Iterable[tuple[str, str]]) -> None:
+        with self._write() as conn:
+            conn.execute("DELETE FROM call_edges")
+            conn.executemany("INSERT OR IGNORE INTO call_edges (caller, callee) VALUES (?, ?)", edges)
+
+    def store_call_graph(self, graph) -> None:
+        """Save the edges of a `CallGraph`."""
+        names = graph.names
+        self.set_call_edges(
+            (names[src], names[dst])
+            for src in range(len(names))
+            for dst in graph.callee_ids(src)
+        )
+
+    # --- reading ---
+
+    def __getitem__(self, qualname: str) -> dict:
+        conn = self.conn
+        row = conn.execute(
+            "SELECT id, filename, lineno, node, extra FROM functions WHERE qualname = ?", (qualname,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(qualname)
+        fid, filename, lineno, node, extra = row
+
+        params: dict[str, dict[str, int]] = {}
+        for name, type_name, count in conn.execute(
+                "SELECT p.name, t.type_name, t.count FROM params p "
+                "LEFT JOIN param_types t ON t.param_id = p.id "
+                "WHERE p.function_id = ? ORDER BY p.position", (fid,)):
+            counts = params.setdefault(name, {})
+            if type_name is not None:
+                counts[type_name] = count
+
+        record = {"params": params, "filename": filename, "lineno": lineno, "node": node}
+        if extra:
+            record.update(json.loads(extra))
+        return record
+
+    def __contains__(self, qualname) -> bool:
+        return self.conn.execute("SELECT 1 FROM functions WHERE qualname = ?", (qualname,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([q for (q,) in self.conn.execute("SELECT qualname FROM functions ORDER BY id")])
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM functions").fetchone()[0]
+
+    def functions_in_module(self, module: str) -> list[str]:
+        return [q for (q,) in self.conn.execute(
+            "SELECT qualname FROM functions WHERE module = ? ORDER BY id", (module,))]
+
+    def functions_accepting(self, type_name: str) -> list[str]:
+        """Qualnames of the functions with a parameter that was seen taking `type_name`."""
+        return [q for (q,) in self.conn.execute(
+            "SELECT DISTINCT f.qualname FROM param_types t "
+            "JOIN params p ON p.id = t.param_id JOIN functions f ON f.id = p.function_id "
+            "WHERE t.type_name = ? ORDER BY f.id", (type_name,))]
+
+    def callees(self, qualname: str) -> list[str]:
+        return [c for (c,) in self.conn.execute(
+            "SELECT callee FROM call_edges WHERE caller = ? ORDER BY callee", (qualname,))]
+
+    def callers(self, qualname: str) -> list[str]:
+        return [c for (c,) in self.conn.execute(
+            "SELECT caller FROM call_edges WHERE callee = ? ORDER BY caller", (qualname,))]
+
+    def call_graph(self):
+        """Rebuild a `CallGraph` from the stored edges."""
+        from soe.function_list.call_graph import CallGraph
+        edges = self.conn.execute("SELECT caller, callee FROM call_edges ORDER BY caller, callee").fetchall()
+        names = sorted({q for edge in edges for q in edge})
+        index = {q: i for i, q in enumerate(names)}
+        adjacency: list[array] = [array("i") for _ in names]
+        for caller, callee in edges:
+            adjacency[index[caller]].append(index[callee])
+        return CallGraph.from_adjacency(names, adjacency)
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type is not None else "COMMIT")
@@ -0,0 +1,110 @@
+# ast_cache.py
+from __future__ import annotations
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from .function_info import FunctionInfo
+
+logger = logging.getLogger('ast_cache')
+
+CACHE_VERSION = 1
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ASTCache:
+    """
+    On-disk cache of per-file `FunctionCollector` results.
+
+    Entries are keyed by absolute file path. A file whose mtime and size are
+    unchanged is a hit without being read; otherwise its content hash decides,
+    so touching a file without editing it does not force a re-parse.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, fullpath: str, modname: str) -> tuple[dict[str, FunctionInfo] | None, bytes | None]:
+        """
+        Return `(functions, None)` on a hit. On a miss return `(None, content)`
+        with the file content already read, or `(None, None)` if unreadable.
+        """
+        try:
+            st = os.stat(fullpath)
+        except OSError:
+            return None, None
+
+        entry = self.entries.get(fullpath)
+        if entry is not None and entry["module"] == modname \
+                and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            self.hits += 1
+            return self._load(entry), None
+
+        try:
+            with open(fullpath, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None, None
+
+        if entry is not None and entry["module"] == modname and entry["hash"] == content_hash(data):
+            # Touched but not modified: refresh the fast-path key
+            entry["mtime_ns"], entry["size"] = st.st_mtime_ns, st.st_size
+            self._dirty = True
+            self.hits += 1
+            return self._load(entry), None
+
+        self.misses += 1
+        return None, data
+
+    def store(self, fullpath: str, modname: str, data: bytes, functions: dict[str, FunctionInfo]) -> None:
+        try:
+            st = os.stat(fullpath)
+        except OSError:
+            return
+        self.entries[fullpath] = {
+            "module": modname,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "hash": content_hash(data),
+            "functions": [f.to_dict() for f in functions.values()],
+        }
+        self._dirty = True
+
+    def prune(self, root_dir: str, seen: set[str]) -> None:
+        """Drop entries under `root_dir` for files that no longer exist."""
+        prefix = os.path.join(os.path.abspath(root_dir), "")
+        for path in [p for p in self.entries if p.startswith(prefix) and p not in seen]:
+            del self.entries[path]
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": self.entries}, f)
+        os.replace(tmp, self.path)
+        self._dirty = False
+        logger.info(f"Saved AST cache to {self.path} ({self.hits} hits, {self.misses} misses)")
+
+    @staticmethod
+    def _load(entry: dict) -> dict[str, FunctionInfo]:
+        infos = (FunctionInfo.from_dict(d) for d in entry["functions"])
+        return {f.qualname: f for f in infos}
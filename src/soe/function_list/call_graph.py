@@ -0,0 +1,195 @@
+# call_graph.py
+from __future__ import annotations
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+
+
+class CallGraph(Mapping):
+    """
+    Compact call graph.
+
+    Qualnames are interned to integer ids (their position in `names`) and
+    edges are kept CSR-style in two int arrays: the callees of node `i` are
+    `targets[offsets[i]:offsets[i + 1]]`. The reverse (caller) index is built
+    on first use.
+
+    As a read-only mapping it behaves like the old `dict[str, set[str]]`,
+    so `graph.get(qualname, set())` still works.
+    """
+
+    def __init__(self, names: list[str], offsets: array, targets: array):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.index: dict[str, int] = {q: i for i, q in enumerate(names)}
+        self._reverse: CallGraph | None = None
+
+    @classmethod
+    def from_adjacency(cls, names: list[str], adjacency: Iterable[Iterable[int]]) -> CallGraph:
+        """Build from one iterable of callee ids per node, in node order."""
+        offsets = array("i", [0])
+        targets = array("i")
+        for callees in adjacency:
+            targets.extend(sorted(set(callees)))
+            offsets.append(len(targets))
+        return cls(names, offsets, targets)
+
+    # --- lookups ---
+
+    def id_of(self, qualname: str) -> int | None:
+        return self.index.get(qualname)
+
+    def name_of(self, node: int) -> str:
+        return self.names[node]
+
+    def callee_ids(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def caller_ids(self, node: int) -> array:
+        return self.reversed().callee_ids(node)
+
+    def callees(self, qualname: str) -> list[str]:
+        node = self.index.get(qualname)
+        return [] if node is None else [self.names[i] for i in self.callee_ids(node)]
+
+    def callers(self, qualname: str) -> list[str]:
+        node = self.index.get(qualname)
+        return [] if node is None else [self.names[i] for i in self.caller_ids(node)]
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    # --- graph queries ---
+
+    def reversed(self) -> CallGraph:
+        """Graph with every edge flipped (callee -> caller), cached."""
+        if self._reverse is None:
+            n = len(self.names)
+            counts = array("i", bytes(4 * (n + 1)))
+            for t in self.targets:
+                counts[t + 1] += 1
+            for i in range(n):
+                counts[i + 1] += counts[i]
+            offsets = array("i", counts)
+            fill = array("i", counts)
+            targets = array("i", bytes(4 * len(self.targets)))
+            for src in range(n):
+                for t in self.targets[self.offsets[src]:self.offsets[src + 1]]:
+                    targets[fill[t]] = src
+                    fill[t] += 1
+            self._reverse = CallGraph(self.names, offsets, targets)
+            self._reverse._reverse = self
+        return self._reverse
+
+    def reachable(self, nodes: Iterable[int]) -> list[int]:
+        """Ids reachable from `nodes` (excluding them unless on a cycle)."""
+        seen = bytearray(len(self.names))
+        offsets, targets = self.offsets, self.targets
+        stack = list(nodes)
+        out = []
+        while stack:
+            v = stack.pop()
+            for w in targets[offsets[v]:offsets[v + 1]]:
+                if not seen[w]:
+                    seen[w] = 1
+                    out.append(w)
+                    stack.append(w)
+        return out
+
+    def transitive_callees(self, qualname: str) -> set[str]:
+        node = self.index.get(qualname)
+        return set() if node is None else {self.names[i] for i in self.reachable([node])}
+
+    def transitive_callers(self, qualname: str) -> set[str]:
+        node = self.index.get(qualname)
+        return set() if node is None else {self.names[i] for i in self.reversed().reachable([node])}
+
+    def sccs(self) -> list[list[int]]:
+        """
+        Strongly connected components (iterative Tarjan). Components come out
+        in reverse topological order: callees before their callers.
+        """
+        n = len(self.names)
+        offsets, targets = self.offsets, self.targets
+        index = [-1] * n
+        low = [0] * n
+        on_stack = bytearray(n)
+        stack: list[int] = []
+        components: list[list[int]] = []
+        counter = 0
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, offsets[root])]
+
+            while work:
+                v, pos = work[-1]
+                if pos < offsets[v + 1]:
+                    work[-1] = (v, pos + 1)
+                    w = targets[pos]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append((w, offsets[w]))
+                    elif on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+
+        return components
+
+    # --- serialization ---
+
+    def to_json_dict(self) -> dict:
+        return {
+            "nodes": self.names,
+            "offsets": self.offsets.tolist(),
+            "targets": self.targets.tolist(),
+        }
+
+    @classmethod
+    def from_json_dict(cls, d: dict) -> CallGraph:
+        return cls(list(d["nodes"]), array("i", d["offsets"]), array("i", d["targets"]))
+
+    def __getstate__(self):
+        return {"names": self.names, "offsets": self.offsets, "targets": self.targets}
+
+    def __setstate__(self, state):
+        self.__init__(state["names"], state["offsets"], state["targets"])
+
+    # --- Mapping interface (qualname -> set of callee qualnames) ---
+
+    def __getitem__(self, qualname: str) -> set[str]:
+        node = self.index[qualname]
+        return {self.names[i] for i in self.callee_ids(node)}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, qualname) -> bool:
+        return qualname in self.index
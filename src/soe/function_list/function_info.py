@@ -1,7 +1,10 @@
 # function_info.py
 from __future__ import annotations
-from dataclasses import dataclass, field
-from typing import Dict, Set, Optional
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Set, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .call_graph import CallGraph
 
 @dataclass
 class FunctionInfo:
@@ -28,10 +31,22 @@ class FunctionInfo:
         self.ensure_param(param_name)
         self.params[param_name][type_name] = self.params[param_name].get(type_name, 0) + delta
 
-    def to_json_dict(self, dep_graph: dict[str, set[str]] | None = None) -> dict:
+    def to_json_dict(self, dep_graph: CallGraph | None = None) -> dict:
         return {
-            "params": self.params,
+            "params": self.params,                  # param -> {type: count}
             "filename": self.filename,
             "lineno": self.lineno,
-            "calls": sorted((dep_graph.get(self.qualname, set()) if dep_graph else set())),
+            "node": dep_graph.id_of(self.qualname) if dep_graph else None,  # id in the call graph
         }
+
+    def to_dict(self) -> dict:
+        """Plain, JSON-serializable form of all fields."""
+        d = asdict(self)
+        d["calls"] = sorted(self.calls)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FunctionInfo":
+        d = dict(d)
+        d["calls"] = set(d.get("calls", ()))
+        return cls(**d)
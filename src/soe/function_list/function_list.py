@@ -1,11 +1,17 @@
 # function_list.py
+from __future__ import annotations
 import os
 import ast
 import json
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import soe._global as _global
 from .function_info import FunctionInfo
+from .call_graph import CallGraph
 from .ast_function_visitor import FunctionCollector
+from .ast_cache import ASTCache
+from .repo_walker import iter_python_files, IGNORE_DIRS
 
 
 def module_name_from_path(root_dir: str, file_path: str) -> str:
@@ -14,49 +20,104 @@ def module_name_from_path(root_dir: str, file_path: str) -> str:
     parts = no_ext.split(os.sep)
     return ".".join(parts)
 
-def collect_functions_in_repo(root_dir: str) -> dict[str, FunctionInfo]:
-    all_functions: dict[str, FunctionInfo] = {}
-
-    for dirpath, _, filenames in os.walk(root_dir):
-        for fname in filenames:
-            if not fname.endswith(".py"):
-                continue
-            fullpath = os.path.join(dirpath, fname)
-
-            try:
-                with open(fullpath, "r", encoding="utf-8") as f:
-                    src = f.read()
-            except (UnicodeDecodeError, OSError):
-                continue
+def analyze_source(src: str | bytes, fullpath: str, modname: str) -> dict[str, FunctionInfo] | None:
+    """Collect the functions defined in one file. Returns None on a syntax error."""
+    try:
+        tree = ast.parse(src, filename=fullpath)
+    except SyntaxError:
+        return None
+
+    collector = FunctionCollector(modname, fullpath)
+    collector.visit(tree)
+    return collector.functions
+
+def _parse_file(fullpath: str, modname: str, data: bytes | None = None) -> dict[str, FunctionInfo] | None:
+    """Read (unless `data` is given) and analyze one file. Runs in pool workers."""
+    if data is None:
+        try:
+            with open(fullpath, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+    try:
+        src = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    return analyze_source(src, fullpath, modname)
+
+def collect_functions_in_repo(
+        root_dir: str,
+        cache: ASTCache | None = None,
+        jobs: int = 1,
+        ignore_dirs: set[str] | frozenset[str] = frozenset(),
+        use_gitignore: bool = False
+    ) -> dict[str, FunctionInfo]:
+    """
+    Collect every function defined under `root_dir`.
+
+    Every `.py` file is scanned unless `ignore_dirs` (e.g.
+    `repo_walker.IGNORE_DIRS`) or `use_gitignore` narrow the walk. With
+    `jobs > 1` parsing is spread over a process pool (`jobs <= 0` uses every
+    core); results are merged in discovery order, so the output does not
+    depend on the number of jobs.
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    paths = iter_python_files(root_dir, ignore_dirs, use_gitignore)
+    files = [(p, module_name_from_path(root_dir, p)) for p in paths]
+    results: list[dict[str, FunctionInfo] | None] = [None] * len(files)
+
+    # (index, fullpath, modname, content or None)
+    tasks: list[tuple[int, str, str, bytes | None]] = []
+    for i, (fullpath, modname) in enumerate(files):
+        if cache is None:
+            tasks.append((i, fullpath, modname, None))
+            continue
+        functions, data = cache.lookup(fullpath, modname)
+        if functions is not None:
+            results[i] = functions
+        elif data is not None:
+            tasks.append((i, fullpath, modname, data))
+
+    def store(parsed):
+        for (i, fullpath, modname, data), functions in zip(tasks, parsed):
+            results[i] = functions
+            if cache is not None:
+                # Unparsable files are cached as empty
+                cache.store(fullpath, modname, data, functions or {})
+
+    if jobs > 1 and len(tasks) > 1:
+        _, paths, modnames, contents = zip(*tasks)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as ex:
+            store(ex.map(_parse_file, paths, modnames, contents, chunksize=max(1, len(tasks) // (jobs * 8))))
+    else:
+        store(_parse_file(fullpath, modname, data) for _, fullpath, modname, data in tasks)
 
-            try:
-                tree = ast.parse(src, filename=fullpath)
-            except SyntaxError:
-                continue
+    all_functions: dict[str, FunctionInfo] = {}
+    for functions in results:
+        if functions:
+            all_functions.update(functions)
 
-            modname = module_name_from_path(root_dir, fullpath)
-            collector = FunctionCollector(modname, fullpath)
-            collector.visit(tree)
-            all_functions.update(collector.functions)
+    if cache is not None:
+        cache.prune(root_dir, {fullpath for fullpath, _ in files})
+        cache.save()
 
     return all_functions
 
-def build_dependency_graph(all_functions: dict[str, FunctionInfo]) -> dict[str, set[str]]:
-    graph: dict[str, set[str]] = defaultdict(set)
+def build_dependency_graph(all_functions: dict[str, FunctionInfo]) -> CallGraph:
+    names = list(all_functions)
 
-    name_index: dict[str, list[str]] = defaultdict(list)
-    for qname, finfo in all_functions.items():
-        name_index[finfo.name].append(qname)
+    name_index: dict[str, list[int]] = defaultdict(list)
+    for node, finfo in enumerate(all_functions.values()):
+        name_index[finfo.name].append(node)
 
-    for caller_qname, finfo in all_functions.items():
+    def callees(finfo: FunctionInfo):
         for call in finfo.calls:
             short = call.split(".")[-1]
-            if short in name_index:
-                for callee_qname in name_index[short]:
-                    graph[caller_qname].add(callee_qname)
-        graph.setdefault(caller_qname, set())
+            yield from name_index.get(short, ())
 
-    return graph
+    return CallGraph.from_adjacency(names, (callees(f) for f in all_functions.values()))
 
 def is_public_function(finfo: FunctionInfo) -> bool:
     if finfo.name.startswith("_"):
@@ -66,26 +127,40 @@ def is_public_function(finfo: FunctionInfo) -> bool:
     return True
 
 
-def generate_function_list(path: Path) -> dict[str, dict]:
+def generate_function_list(
+        path: Path,
+        cache_file: Path | None = None,
+        jobs: int = 1,
+        respect_ignores: bool = False
+    ) -> dict[str, dict]:
+    """
+    Build, save and return the function list of the repository at `path`.
+
+    :param respect_ignores: skip `IGNORE_DIRS` and .gitignore'd paths
+        instead of scanning every file
+    """
     PROJECT_ROOT = Path(__file__).resolve().parents[3]
     root = os.path.abspath(PROJECT_ROOT / path)
     public_only = True
 
-    all_funcs = collect_functions_in_repo(root)
+    cache = ASTCache(cache_file) if cache_file is not None else None
+    all_funcs = collect_functions_in_repo(
+        root,
+        cache=cache,
+        jobs=jobs,
+        ignore_dirs=IGNORE_DIRS if respect_ignores else frozenset(),
+        use_gitignore=respect_ignores
+    )
     funcs = {q: f for q, f in all_funcs.items() if is_public_function(f)} if public_only else all_funcs
     dep_graph = build_dependency_graph(all_funcs)
 
+    # Records reference their node in the shared call graph instead of
+    # embedding edge lists
     out = {
-        "functions": {
-            q: {
-                "params": f.params,                     # ✅ param -> {type: count}
-                "filename": f.filename,
-                "lineno": f.lineno,
-                "calls": sorted(dep_graph.get(q, set())),# ✅ list for JSON
-            }
-            for q, f in funcs.items()
-        }
+        "functions": {q: f.to_json_dict(dep_graph) for q, f in funcs.items()},
+        "call_graph": dep_graph.to_json_dict(),
     }
+    _global.set_call_graph(dep_graph)
 
     curr_dir = os.path.dirname(os.path.abspath(__file__))
     output_path = os.path.join(curr_dir, "function_list.json")
@@ -0,0 +1,152 @@
+# repo_walker.py
+from __future__ import annotations
+import os
+import re
+from typing import Iterator
+
+
+# Directories never scanned for fuzz targets by freq_list, and skipped by
+# the function list walker when asked to
+IGNORE_DIRS = frozenset({'tests', 'testing', 'benchmarks', 'examples', '_examples', 'conftest',
+                         'cython', 'include', 'distutils', 'f2py', '.git', '__pycache__', 'venv', 'env'})
+
+
+def _translate(pattern: str) -> str:
+    """Translate the glob part of a .gitignore pattern to a regex."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class GitIgnore:
+    """
+    Rules of one .gitignore file. Supports comments, negation (`!`),
+    directory-only patterns (trailing `/`), anchoring and `**`.
+    """
+
+    def __init__(self, base_dir: str, lines: list[str]):
+        self.base_dir = base_dir
+        self.rules: list[tuple[re.Pattern, bool, bool]] = []  # (regex, negate, dir_only)
+
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            line = line.lstrip("/")
+            prefix = "" if anchored else "(?:.*/)?"
+            self.rules.append((re.compile(f"^{prefix}{_translate(line)}$"), negate, dir_only))
+
+    @classmethod
+    def from_dir(cls, dir_path: str) -> GitIgnore | None:
+        try:
+            with open(os.path.join(dir_path, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+                return cls(dir_path, f.readlines())
+        except OSError:
+            return None
+
+    def match(self, path: str, is_dir: bool) -> bool | None:
+        """True/False if a rule decides `path`, None if no rule applies."""
+        rel = os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                result = not negate
+        return result
+
+
+def _ignored(path: str, is_dir: bool, gitignores: list[GitIgnore]) -> bool:
+    # Deeper .gitignore files take precedence
+    for gi in reversed(gitignores):
+        decision = gi.match(path, is_dir)
+        if decision is not None:
+            return decision
+    return False
+
+
+def iter_python_files(
+        root_dir: str,
+        ignore_dirs: set[str] | frozenset[str] = frozenset(),
+        use_gitignore: bool = False
+    ) -> Iterator[str]:
+    """
+    Yield the `.py` files under `root_dir` in a deterministic (sorted,
+    depth-first) order, skipping directories named in `ignore_dirs` and,
+    with `use_gitignore`, paths excluded by `.gitignore` files found along
+    the way.
+    """
+    root_dir = os.path.abspath(root_dir)
+    stack: list[tuple[str, list[GitIgnore]]] = [(root_dir, [])]
+
+    while stack:
+        dir_path, gitignores = stack.pop()
+        if use_gitignore:
+            gi = GitIgnore.from_dir(dir_path)
+            if gi is not None and gi.rules:
+                gitignores = gitignores + [gi]
+
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in ignore_dirs or entry.is_symlink():
+                    continue
+                if gitignores and _ignored(entry.path, True, gitignores):
+                    continue
+                subdirs.append(entry.path)
+            elif entry.name.endswith(".py"):
+                if gitignores and _ignored(entry.path, False, gitignores):
+                    continue
+                yield entry.path
+
+        # Reversed so the stack visits subdirectories in sorted order
+        for sub in reversed(subdirs):
+            stack.append((sub, gitignores))
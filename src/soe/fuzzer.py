@@ -1,24 +1,221 @@
 from pathlib import Path
+import os
+import sys
 import logging
+from concurrent.futures import ProcessPoolExecutor
 import soe._global as _global
-import soe.run as run
-from soe.run import run
+from soe.run import (
+    run, json_safe, sample_counts, samples_since, export_samples, import_samples, detach_sample_store
+)
+from soe.result_log import ResultLog, compact
+from soe.sample_pool import SamplePool, DEFAULT_SEED
+from soe.checkpoint import Checkpoint
+from soe import profiling
 
 logger = logging.getLogger('fuzzer')
 
-def fuzz(fuzz_dir: Path) -> None:
-    while True:
-        func_list = _global.get_function_list()
-        for f_name in func_list:
-            params = func_list[f_name].get("params", {}).keys()
-            try:
-                result = run(f_name, params)
-            except Exception as e:
+
+# Runs per function with fresh inputs from the sample pool, until one succeeds
+INPUT_ATTEMPTS = 5
+
+
+def _merge_samples(type_list: dict, record: dict) -> None:
+    for k, vals in record["samples"].items():
+        type_list.setdefault(k, []).extend(vals)
+
+
+def _run_function(f_name: str, func_list: dict, inputs: SamplePool | None = None) -> None:
+    """
+    Trace one function. Arguments come from `inputs`, with a new draw for
+    each of `INPUT_ATTEMPTS` attempts, or are the parameter names when the
+    pool has nothing to offer.
+    """
+    params = func_list[f_name].get("params", {})
+    for attempt in range(INPUT_ATTEMPTS):
+        args = inputs.args_for(params) if inputs is not None else None
+        last = args is None or attempt == INPUT_ATTEMPTS - 1
+        if args is None:
+            args = list(params.keys())
+        try:
+            result = run(f_name, args)
+        except Exception as e:
+            if last:
                 print(f"Error running {f_name}: {e}")
-            else:
-                if result is not None:
-                    _global.set_type_list(result)
-                    
-        break
-    return 
+                return
+            logger.debug(f"Attempt {attempt + 1} of {f_name} failed: {e}")
+        else:
+            if result is not None:
+                _global.set_type_list(result)
+            return
+
+
+def caller_first_order(f_names: list[str], graph) -> list[str]:
+    """
+    `f_names` ordered callers before callees (reversed strongly connected
+    components of the call graph), so the objects a caller builds are in
+    the sample pool by the time its callees run. Functions missing from the
+    graph keep their relative order, at the end.
+    """
+    if graph is None:
+        return list(f_names)
+    wanted = set(f_names)
+    order = []
+    for component in reversed(graph.sccs()):
+        for node in sorted(component):
+            qualname = graph.name_of(node)
+            if qualname in wanted:
+                order.append(qualname)
+    placed = set(order)
+    return order + [f for f in f_names if f not in placed]
+
+
+def _init_shard_worker(function_list: dict | None, sys_path: list, function_db=None, profile: bool = False) -> None:
+    """Give a fuzz worker the parent's function list (or database), import path and profiling mode."""
+    sys.path[:] = sys_path
+    if profile:
+        profiling.enable()
+    if function_db is not None:
+        # Stats are handed to the parent, which writes them at checkpoints
+        _global.set_function_db(function_db)
+    else:
+        for f_name, f_info in function_list.items():
+            _global.set_function(f_name, f_info)
+    # Samples are persisted by the parent once merged
+    detach_sample_store()
+
+
+def _param_counts(func_list: dict) -> dict[tuple[str, str, str], int]:
+    return {
+        (f_name, param, t_name): count
+        for f_name, f_info in func_list.items()
+        for param, counts in f_info.get("params", {}).items()
+        for t_name, count in counts.items()
+    }
 
+
+def _fuzz_shard(f_names: list[str], seed: int = DEFAULT_SEED) -> tuple[list[tuple[str, dict]], dict, dict | None]:
+    """
+    Trace the functions of one shard, drawing inputs seeded with `seed`.
+    Returns (function, exported new samples) pairs, the parameter type
+    counts the parent still has to add and, when profiling, the timers and
+    counters of the shard.
+    """
+    func_list = _global.get_function_list()
+    in_memory = _global.get_function_db() is None
+    before = _param_counts(func_list) if in_memory else {}
+    inputs = SamplePool(_global.get_type_list(), seed)
+    out = []
+    for f_name in f_names:
+        counts = sample_counts()
+        with profiling.phase("fuzz.targets"):
+            _run_function(f_name, func_list, inputs)
+        new_samples = samples_since(counts)
+        if new_samples:
+            out.append((f_name, export_samples(new_samples)))
+    stats = {} if in_memory else _global.take_param_stats()
+    if in_memory:
+        for key, count in _param_counts(func_list).items():
+            if count > before.get(key, 0):
+                stats[key] = count - before.get(key, 0)
+    profile = None
+    if profiling.current() is not None:
+        # Handed to the parent once, the next shard starts from zero
+        profile = profiling.current().export()
+        profiling.enable()
+    return out, stats, profile
+
+
+def _shards(f_names: list[str], jobs: int) -> list[list[str]]:
+    # Several shards per worker so one slow shard does not hold up the rest
+    size = max(1, -(-len(f_names) // (jobs * 4)))
+    return [f_names[i:i + size] for i in range(0, len(f_names), size)]
+
+
+def fuzz(
+        fuzz_dir: Path,
+        output_dir: Path = Path("."),
+        jobs: int = 1,
+        checkpoint: Checkpoint | None = None,
+        seed: int = DEFAULT_SEED
+    ) -> None:
+    """
+    Trace every function of the function list and collect type samples.
+
+    Functions run callers first (see `caller_first_order`), with arguments
+    drawn from the samples harvested so far.
+
+    :param jobs: with more than one job (0 uses every core) the function
+        list is sharded over a process pool, each shard traced in its own
+        interpreter; shard samples are merged in scheduling order
+    :param seed: seed of the input draws, so serial runs over the same
+        function list and samples are reproducible; shard i draws with
+        `seed + i`
+    :param checkpoint: functions it marks done are skipped, and every
+        processed function is marked done; a resumed campaign appends to
+        the existing type_list.jsonl
+    """
+    # New samples of every function are streamed to type_list.jsonl and
+    # compacted into type_list.json once at the end
+    log_path = output_dir / "type_list.jsonl"
+    type_log = ResultLog(log_path, truncate=not (checkpoint and checkpoint.done))
+    if checkpoint is not None:
+        checkpoint.before_save(type_log.sync)
+
+    def log_samples(f_name, new_samples):
+        if new_samples:
+            with profiling.phase("fuzz.log_samples"):
+                type_log.append({
+                    "function": f_name,
+                    "samples": {k: [json_safe(v) for v in vals] for k, vals in new_samples.items()}
+                })
+
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    try:
+        func_list = _global.get_function_list()
+        order = caller_first_order(list(func_list), _global.get_call_graph())
+        if checkpoint is not None:
+            order = [f for f in order if not checkpoint.is_done(f)]
+            logger.info(f"{len(func_list) - len(order)} functions already done")
+        if jobs > 1 and len(order) > 1:
+            shards = _shards(order, jobs)
+            seeds = [seed + i for i in range(len(shards))]
+            logger.info(f"Fuzzing {len(func_list)} functions in {len(shards)} shards on {jobs} workers")
+            function_db = _global.get_function_db()
+            profiler = profiling.current()
+            initargs = (
+                None if function_db is not None else dict(func_list), list(sys.path), function_db, profiler is not None
+            )
+            with profiling.phase("fuzz.pool"), ProcessPoolExecutor(
+                    max_workers=min(jobs, len(shards)),
+                    initializer=_init_shard_worker,
+                    initargs=initargs
+                ) as ex:
+                for shard, (shard_results, stats, profile) in zip(shards, ex.map(_fuzz_shard, shards, seeds)):
+                    for f_name, exported in shard_results:
+                        log_samples(f_name, import_samples(exported))
+                    _global.add_param_stats(stats)
+                    if profile is not None:
+                        profiler.merge(profile)
+                    if checkpoint is not None:
+                        for f_name in shard:
+                            checkpoint.mark_done(f_name)
+        else:
+            inputs = SamplePool(_global.get_type_list(), seed)
+            for f_name in order:
+                counts = sample_counts()
+                try:
+                    with profiling.phase("fuzz.targets"):
+                        _run_function(f_name, func_list, inputs)
+                finally:
+                    log_samples(f_name, samples_since(counts))
+                if checkpoint is not None:
+                    checkpoint.mark_done(f_name)
+    finally:
+        if checkpoint is not None:
+            checkpoint.save()
+        type_log.close()
+        with profiling.phase("fuzz.compact"):
+            compact(log_path, output_dir / "type_list.json", _merge_samples)
+    return
@@ -0,0 +1,179 @@
+import io
+import json
+import time
+import pstats
+import cProfile
+import logging
+import contextlib
+from pathlib import Path
+
+logger = logging.getLogger('profiling')
+
+
+# Length of every ranked list in the report
+REPORT_TOP = 25
+
+# Active Profiler, None when profiling is off
+_profiler = None
+
+
+class Profiler:
+    """
+    Low-overhead timers and counters of one soe run.
+
+    Phases are named wall-clock sections (`phase`), targets are the timed
+    executions of single functions, split into import and traced run time
+    (`record_target`), counters are plain event counts (tracer events,
+    samples added, duplicates rejected, ...). With `cprofile` the whole run
+    is also profiled by cProfile, for a function-level hot path.
+    """
+
+    def __init__(self, cprofile: bool = False):
+        self.start = time.perf_counter()
+        self.phases: dict[str, list] = {}  # name -> [calls, seconds]
+        self.targets: dict[str, list] = {}  # name -> [runs, import seconds, run seconds]
+        self.counters: dict[str, int] = {}
+        self.cprofile = cProfile.Profile() if cprofile else None
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float, calls: int = 1) -> None:
+        entry = self.phases.setdefault(name, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_target(self, name: str, import_s: float, run_s: float) -> None:
+        entry = self.targets.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += import_s
+        entry[2] += run_s
+
+    def export(self) -> dict:
+        """Timers and counters, for `merge` into the profiler of another process."""
+        return {"phases": self.phases, "targets": self.targets, "counters": self.counters}
+
+    def merge(self, exported: dict) -> None:
+        for name, (calls, seconds) in exported["phases"].items():
+            self.add_phase(name, seconds, calls)
+        for name, (runs, import_s, run_s) in exported["targets"].items():
+            entry = self.targets.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += runs
+            entry[1] += import_s
+            entry[2] += run_s
+        for name, n in exported["counters"].items():
+            self.count(name, n)
+
+    def stop(self) -> None:
+        if self.cprofile is not None:
+            self.cprofile.disable()
+
+    def report(self) -> dict:
+        """Everything ranked, slowest first."""
+        total = time.perf_counter() - self.start
+        phases = sorted(self.phases.items(), key=lambda kv: -kv[1][1])
+        targets = sorted(self.targets.items(), key=lambda kv: -(kv[1][1] + kv[1][2]))
+        report = {
+            "total_seconds": total,
+            "phases": [
+                {"name": name, "calls": calls, "seconds": seconds, "share": seconds / total if total else 0.0}
+                for name, (calls, seconds) in phases
+            ],
+            "targets": {
+                "count": len(targets),
+                "import_seconds": sum(t[1] for t in self.targets.values()),
+                "run_seconds": sum(t[2] for t in self.targets.values()),
+                "slowest": [
+                    {"name": name, "runs": runs, "import_seconds": import_s, "run_seconds": run_s}
+                    for name, (runs, import_s, run_s) in targets[:REPORT_TOP]
+                ],
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+        if self.cprofile is not None:
+            stats = pstats.Stats(self.cprofile)
+            rows = []
+            for (filename, lineno, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+                rows.append({
+                    "function": f"{filename}:{lineno}({func})",
+                    "calls": ncalls,
+                    "tottime": tottime,
+                    "cumtime": cumtime,
+                })
+            rows.sort(key=lambda r: -r["tottime"])
+            report["hot_functions"] = rows[:REPORT_TOP]
+        return report
+
+    def write(self, output_dir: Path) -> Path:
+        """Write profile.json and profile.txt (and profile.pstats with cProfile) to `output_dir`."""
+        self.stop()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        with open(output_dir / "profile.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        with open(output_dir / "profile.txt", "w", encoding="utf-8") as f:
+            f.write(format_report(report))
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(output_dir / "profile.pstats")
+        return output_dir / "profile.txt"
+
+
+def format_report(report: dict) -> str:
+    out = io.StringIO()
+    out.write(f"soe profile, {report['total_seconds']:.3f}s total\n\n")
+
+    out.write("Phases (dotted phases are part of their prefix)\n")
+    for p in report["phases"]:
+        out.write(f"  {p['seconds']:10.3f}s {p['share'] * 100:5.1f}%  {p['calls']:>7}x  {p['name']}\n")
+
+    t = report["targets"]
+    out.write(f"\nTargets: {t['count']}, {t['import_seconds']:.3f}s importing, {t['run_seconds']:.3f}s running traced\n")
+    for s in t["slowest"]:
+        out.write(f"  {s['import_seconds'] + s['run_seconds']:10.3f}s {s['runs']:>5}x  {s['name']}"
+                  f"  (import {s['import_seconds']:.3f}s)\n")
+
+    out.write("\nCounters\n")
+    for name, n in report["counters"].items():
+        out.write(f"  {n:>12}  {name}\n")
+
+    if "hot_functions" in report:
+        out.write("\nHot functions (cProfile, by own time)\n")
+        for r in report["hot_functions"]:
+            out.write(f"  {r['tottime']:10.3f}s {r['cumtime']:10.3f}s cum {r['calls']:>9}x  {r['function']}\n")
+    return out.getvalue()
+
+
+def enable(cprofile: bool = False) -> Profiler:
+    global _profiler
+    _profiler = Profiler(cprofile=cprofile)
+    return _profiler
+
+
+def disable() -> Profiler | None:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def current() -> Profiler | None:
+    return _profiler
+
+
+def phase(name: str):
+    """Time a section if profiling is on, a no-op context otherwise."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.phase(name)
@@ -0,0 +1,223 @@
+import heapq
+import itertools
+import threading
+import logging
+from collections.abc import Callable, Iterator, Mapping, MutableMapping
+from typing import Any
+
+logger = logging.getLogger('registry')
+
+
+DEFAULT_SHARDS = 16
+
+_MISSING = object()
+
+
+class _Shard:
+    __slots__ = ("lock", "data")
+
+    def __init__(self, data: dict):
+        self.lock = threading.Lock()
+        # key -> (insertion seq, value); replaced, never mutated, once published
+        self.data = data
+
+
+class Snapshot(Mapping):
+    """
+    Immutable view of a registry at one point in time, iterated in
+    insertion order. Values are shared with the registry, not copied.
+    """
+
+    def __init__(self, shards: tuple[dict, ...], mask: int):
+        self._shards = shards
+        self._mask = mask
+        self._order = None
+
+    def __getitem__(self, key):
+        return self._shards[hash(key) & self._mask][key][1]
+
+    def __contains__(self, key) -> bool:
+        return key in self._shards[hash(key) & self._mask]
+
+    def __len__(self) -> int:
+        return sum(len(d) for d in self._shards)
+
+    def _keys(self) -> list:
+        if self._order is None:
+            # Each shard is already in seq order
+            merged = heapq.merge(*(((seq, key) for key, (seq, _) in d.items()) for d in self._shards))
+            self._order = [key for _, key in merged]
+        return self._order
+
+    def __iter__(self) -> Iterator:
+        return iter(self._keys())
+
+    def items(self):
+        shards, mask = self._shards, self._mask
+        return [(key, shards[hash(key) & mask][key][1]) for key in self._keys()]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+
+class ShardedRegistry(MutableMapping):
+    """
+    Dict-like registry for state shared by tracer threads and fuzz workers.
+
+    Keys are spread over `shards` (a power of two) by hash. Every shard is a
+    copy-on-write dict: a writer copies one shard under that shard's lock
+    and publishes the copy, so writers on different shards never wait for
+    each other and readers never take a lock at all. Iteration goes over a
+    `Snapshot`, cached until the next write, in insertion order like a dict.
+
+    Values are stored as given; mutating one in place (appending to a sample
+    list) is visible to every reader and snapshot. Replace a value, or use
+    `apply`, for changes readers must see atomically.
+    """
+
+    def __init__(self, data: Mapping | None = None, shards: int = DEFAULT_SHARDS):
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError(f"shards must be a power of two, got {shards}")
+        self._mask = shards - 1
+        self._shards = [_Shard({}) for _ in range(shards)]
+        self._seq = itertools.count()
+        self._writes = itertools.count(1)
+        self._version = 0
+        self._snapshot = (-1, None)
+        # Bumped whenever the contents are swapped wholesale
+        self.generation = 0
+        if data:
+            self.update(data)
+
+    def __getstate__(self):
+        return {"data": dict(self.items()), "shards": len(self._shards)}
+
+    def __setstate__(self, state):
+        self.__init__(state["data"], state["shards"])
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def _shard(self, key) -> _Shard:
+        return self._shards[hash(key) & self._mask]
+
+    def _published(self) -> None:
+        self._version = next(self._writes)
+
+    # --- lock-free reads ---
+
+    def __getitem__(self, key):
+        return self._shard(key).data[key][1]
+
+    def get(self, key, default=None):
+        entry = self._shard(key).data.get(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def __contains__(self, key) -> bool:
+        return key in self._shard(key).data
+
+    def __len__(self) -> int:
+        return sum(len(s.data) for s in self._shards)
+
+    def snapshot(self) -> Snapshot:
+        version, snap = self._snapshot
+        if version != self._version or snap is None:
+            # Tagged with the version read first: a write racing with the
+            # build only makes the next call rebuild
+            version = self._version
+            snap = Snapshot(tuple(s.data for s in self._shards), self._mask)
+            self._snapshot = (version, snap)
+        return snap
+
+    def __iter__(self) -> Iterator:
+        return iter(self.snapshot())
+
+    def items(self):
+        return self.snapshot().items()
+
+    def values(self):
+        return self.snapshot().values()
+
+    # --- copy-on-write updates ---
+
+    def __setitem__(self, key, value) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            data = dict(shard.data)
+            entry = data.get(key)
+            data[key] = (entry[0] if entry is not None else next(self._seq), value)
+            shard.data = data
+        self._published()
+
+    def __delitem__(self, key) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            if key not in shard.data:
+                raise KeyError(key)
+            data = dict(shard.data)
+            del data[key]
+            shard.data = data
+        self._published()
+
+    def setdefault(self, key, default=None):
+        entry = self._shard(key).data.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry[1]
+        shard = self._shard(key)
+        with shard.lock:
+            # Another writer may have won the race
+            entry = shard.data.get(key, _MISSING)
+            if entry is not _MISSING:
+                return entry[1]
+            data = dict(shard.data)
+            data[key] = (next(self._seq), default)
+            shard.data = data
+        self._published()
+        return default
+
+    def apply(self, key, fn: Callable[[Any], Any]) -> bool:
+        """
+        Replace the value of `key` with `fn(value)`, atomically with respect
+        to other writers of its shard. Returns False if `key` is missing.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.data.get(key)
+            if entry is None:
+                return False
+            data = dict(shard.data)
+            data[key] = (entry[0], fn(entry[1]))
+            shard.data = data
+        self._published()
+        return True
+
+    def update(self, other=(), **kw) -> None:
+        """Batched `__setitem__`: one copy per shard touched."""
+        items = other.items() if isinstance(other, Mapping) else other
+        grouped: dict[int, list] = {}
+        for key, value in itertools.chain(items, kw.items()):
+            grouped.setdefault(hash(key) & self._mask, []).append((key, value))
+        for i, pairs in grouped.items():
+            shard = self._shards[i]
+            with shard.lock:
+                data = dict(shard.data)
+                for key, value in pairs:
+                    entry = data.get(key)
+                    data[key] = (entry[0] if entry is not None else next(self._seq), value)
+                shard.data = data
+        if grouped:
+            self._published()
+
+    def replace(self, other: Mapping) -> None:
+        """Swap the whole contents for those of `other`."""
+        fresh = [{} for _ in self._shards]
+        for key, value in other.items():
+            fresh[hash(key) & self._mask][key] = (next(self._seq), value)
+        for shard, data in zip(self._shards, fresh):
+            with shard.lock:
+                shard.data = data
+        self.generation += 1
+        self._published()
+
+    def clear(self) -> None:
+        self.replace({})
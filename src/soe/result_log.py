@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+logger = logging.getLogger('result_log')
+
+
+def _repair_tail(path: Path) -> None:
+    """
+    Make `path` end with a complete line before appending to it. A record
+    torn by a crash is cut off; a whole record only missing its newline
+    gets one.
+    """
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        start = end
+        while start > 0:
+            size = min(start, 1 << 16)
+            f.seek(start - size)
+            i = f.read(size).rfind(b"\n")
+            if i != -1:
+                start = start - size + i + 1
+                break
+            start -= size
+        if start == end:
+            return
+        f.seek(start)
+        try:
+            json.loads(f.read())
+        except ValueError:
+            logger.warning(f"Dropping a torn record at the end of {path}")
+            f.truncate(start)
+        else:
+            f.write(b"\n")
+
+
+class ResultLog:
+    """
+    Append-only JSONL log. Each `append` writes one record (one line), so the
+    cost of saving results is proportional to the new data instead of the
+    whole result set. The file is fsynced every `fsync_every` records or
+    `fsync_interval` seconds, whichever comes first. Without `truncate`,
+    appends continue an existing log, after repairing a torn last line.
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            truncate: bool = True,
+            fsync_every: int = 100,
+            fsync_interval: float = 5.0,
+            encoder: type[json.JSONEncoder] | None = None
+        ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.encoder = encoder
+
+        if not truncate:
+            _repair_tail(self.path)
+        self._f = open(self.path, "w" if truncate else "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, record: dict) -> None:
+        self._f.write(json.dumps(record, cls=self.encoder, separators=(",", ":")))
+        self._f.write("\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+
+def read_log(path: Path) -> Iterator[dict]:
+    """Yield the records of a log, ignoring a torn last line after a crash."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping corrupt record in {path}")
+
+
+def compact(
+        log_path: Path,
+        out_path: Path,
+        reducer: Callable[[Any, dict], None],
+        initial: Any = None,
+        indent: int | None = 2
+    ) -> Any:
+    """
+    Replay a log into a single JSON document.
+
+    :param reducer: called as `reducer(state, record)` for every record
+    :param initial: initial state (default: empty dict)
+
+    :return: the final state, which is also written to `out_path`
+    """
+    state = {} if initial is None else initial
+    for record in read_log(log_path):
+        reducer(state, record)
+
+    tmp = Path(out_path).with_name(Path(out_path).name + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=indent)
+        os.replace(tmp, out_path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return state
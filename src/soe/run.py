@@ -1,13 +1,20 @@
 import sys
 import os
+import site
+import sysconfig
 import inspect
 import hashlib
+import dis
+import weakref
 import importlib.util
-import builtins
 import json
-from soe._global import get_function_list, get_type_list, set_function_list, set_type_list
+import pickle
+import time
+from soe import profiling
+from soe._global import get_function_list, get_type_list, add_param_stats
 from collections import defaultdict
 import logging
+from typing import NamedTuple
 
 
 logger = logging.getLogger('run')
@@ -21,34 +28,194 @@ _type_seen = {}  # {"int": {"1","2"}, "numpy.ndarray": {"...hash..."}, ...}
 
 MAX_SAMPLES_PER_TYPE = 50
 
+# Outcomes of `_add_type_sample`, reported by profiling
+sample_stats = {"samples_added": 0, "duplicates_rejected": 0, "over_cap": 0}
+
+# Optional SampleStore that persists every accepted sample as it is captured
+_sample_store = None
+
+
+def attach_sample_store(store, load: bool = False) -> None:
+    """
+    Persist new samples to `store` and seed duplicate detection with the
+    fingerprints it already holds, so a resumed campaign does not re-capture
+    them.
+
+    :param load: also unpickle the stored samples into `type_list`, where
+        the sample pool draws fuzz inputs from
+    """
+    global _sample_store
+    _sample_store = store
+    if store is not None:
+        for k in store.keys():
+            _type_seen.setdefault(k, set()).update(store.fingerprints(k))
+            if load:
+                type_list.setdefault(k, []).extend(store.samples(k))
+
+
+def detach_sample_store():
+    global _sample_store
+    store, _sample_store = _sample_store, None
+    return store
+
 # ----------------------------
 # Duplicate-safe fingerprinting
 # ----------------------------
-def _fingerprint(val) -> str:
-    """
-    Return a stable-ish fingerprint for a value so we can prevent duplicates.
-    - Primitives: exact value
-    - Lists/tuples/dicts: structural fingerprint
-    - numpy.ndarray: dtype+shape+bytes hash (fallback to repr if needed)
-    - Other objects: module.qualname + repr()
-    """
-    if val is None or isinstance(val, (int, float, str, bool)):
-        return f"{type(val).__name__}:{val!r}"
+# Bounds that keep fingerprinting O(1) in the size of the value: nesting
+# depth, values hashed per fingerprint (all levels together, so wide and
+# deep values cannot multiply), and bytes per buffer/string (beyond
+# FP_MAX_BYTES only the head and tail are hashed, plus the length).
+FP_MAX_DEPTH = 4
+FP_MAX_NODES = 256
+FP_MAX_BYTES = 64 * 1024
+# Primitives up to this repr length are used verbatim as their fingerprint
+FP_MAX_LITERAL = 256
+
+_CONTAINERS = (list, tuple, set, frozenset, dict)
+
+
+def _feed_bytes(h, data) -> None:
+    n = len(data)
+    h.update(n.to_bytes(8, "little"))
+    if n <= 2 * FP_MAX_BYTES:
+        h.update(data)
+    else:
+        h.update(data[:FP_MAX_BYTES])
+        h.update(data[-FP_MAX_BYTES:])
+
+
+def _feed_buffer(h, val) -> bool:
+    """Hash a buffer-protocol object (bytes, array, ndarray, ...) without copying."""
+    try:
+        mv = memoryview(val)
+    except TypeError:
+        return False
+    try:
+        # Object buffers hold pointers, not values
+        if "O" in mv.format:
+            return False
+        h.update(f"{mv.format}{mv.shape}".encode())
+        flat = None
+        if mv.c_contiguous:
+            try:
+                flat = mv.cast("B")
+            except (TypeError, ValueError):
+                pass
+        if flat is not None:
+            _feed_bytes(h, flat)
+            flat.release()
+        elif mv.nbytes <= 2 * FP_MAX_BYTES:
+            h.update(mv.tobytes())
+        else:
+            h.update(f"{mv.strides}".encode())
+            _feed_bytes(h, _safe_repr(val).encode("utf-8", "backslashreplace"))
+        return True
+    finally:
+        mv.release()
+
+
+def _safe_repr(val) -> str:
+    try:
+        return repr(val)
+    except Exception:
+        return f"<unrepresentable at {id(val):#x}>"
+
 
-    if isinstance(val, (list, tuple)):
-        inner = ",".join(_fingerprint(x) for x in val)
-        return f"{type(val).__name__}:[{inner}]"
+def _out_of_budget(h, budget: list) -> bool:
+    """True once `budget` (a one-element count of values left) is spent; marks the hash truncated once."""
+    if budget[0] > 0:
+        return False
+    if budget[0] == 0:
+        h.update(b"<truncated>")
+        budget[0] = -1
+    return True
 
-    if isinstance(val, dict):
-        # sort by key string to make deterministic
-        items = sorted(val.items(), key=lambda kv: str(kv[0]))
-        inner = ",".join(f"{str(k)!r}:{_fingerprint(v)}" for k, v in items)
-        return f"dict:{{{inner}}}"
+
+def _feed(h, val, depth: int, budget: list) -> None:
+    if _out_of_budget(h, budget):
+        return
+    budget[0] -= 1
 
     cls = val.__class__
+    h.update(f"{cls.__module__}.{cls.__qualname__}|".encode())
+
+    if val is None or cls in (bool, int, float, complex):
+        h.update(repr(val).encode())
+        return
+
+    if isinstance(val, str):
+        # Length first, so adjacent strings of a container cannot shift into each other
+        h.update(len(val).to_bytes(8, "little"))
+        if len(val) > 2 * FP_MAX_BYTES:
+            val = val[:FP_MAX_BYTES] + val[-FP_MAX_BYTES:]
+        h.update(val.encode("utf-8", "surrogatepass"))
+        return
+
+    if isinstance(val, _CONTAINERS):
+        h.update(len(val).to_bytes(8, "little"))
+        if depth <= 0:
+            return
+        if isinstance(val, dict):
+            if len(val) <= FP_MAX_NODES:
+                # sort by key string to make deterministic
+                items = sorted(val.items(), key=lambda kv: str(kv[0]))
+            else:
+                items = val.items()
+            for k, v in items:
+                if _out_of_budget(h, budget):
+                    break
+                _feed(h, k, depth - 1, budget)
+                _feed(h, v, depth - 1, budget)
+        else:
+            for x in val:
+                if _out_of_budget(h, budget):
+                    break
+                _feed(h, x, depth - 1, budget)
+        return
+
+    if _feed_buffer(h, val):
+        return
+
+    # Objects without a custom repr are identified by their state
+    state = getattr(val, "__dict__", None)
+    if cls.__repr__ is object.__repr__ and isinstance(state, dict):
+        if depth > 0:
+            _feed(h, state, depth - 1, budget)
+        return
 
     # fallback
-    return f"{cls.__module__}.{cls.__qualname__}:{repr(val)}"
+    _feed_bytes(h, _safe_repr(val).encode("utf-8", "backslashreplace"))
+
+
+def _fingerprint(val, cache: dict | None = None) -> str:
+    """
+    Return a stable-ish fingerprint for a value so we can prevent duplicates.
+    - Short primitives: exact value
+    - Everything else: incremental blake2b over type, structure and content,
+      bounded by FP_MAX_DEPTH / FP_MAX_NODES / FP_MAX_BYTES
+    - Buffer-protocol objects (numpy.ndarray, bytes, ...): format + shape +
+      a zero-copy memoryview hash of the data
+
+    :param cache: optional `id(val) -> fingerprint` map; only valid while all
+        values are alive, i.e. within a single trace event
+    """
+    if val is None or isinstance(val, (int, float, bool)) or (isinstance(val, str) and len(val) <= FP_MAX_LITERAL):
+        literal = f"{type(val).__name__}:{val!r}"
+        if len(literal) <= FP_MAX_LITERAL + 16:
+            return literal
+
+    if cache is not None:
+        fp = cache.get(id(val))
+        if fp is not None:
+            return fp
+
+    h = hashlib.blake2b(digest_size=16)
+    _feed(h, val, FP_MAX_DEPTH, [FP_MAX_NODES])
+    fp = h.hexdigest()
+
+    if cache is not None:
+        cache[id(val)] = fp
+    return fp
 
 
 def type_key(val) -> str:
@@ -69,20 +236,111 @@ def type_key(val) -> str:
     return qual if mod == "builtins" else f"{mod}.{qual}"
 
 
-def _add_type_sample(val):
+def _add_type_sample(val, fp_cache: dict | None = None):
     k = type_key(val)
-    bucket = type_list.setdefault(k, [])
-    if len(bucket) >= MAX_SAMPLES_PER_TYPE:
+    seen = _type_seen.setdefault(k, set())
+    # One fingerprint per accepted sample, including those of an attached store
+    if len(seen) >= MAX_SAMPLES_PER_TYPE:
+        sample_stats["over_cap"] += 1
         return
 
-    seen = _type_seen.setdefault(k, set())
-    fp = _fingerprint(val)
+    fp = _fingerprint(val, fp_cache)
 
     if fp in seen:
+        sample_stats["duplicates_rejected"] += 1
         return  # duplicate, skip
 
-    bucket.append(val)
+    sample_stats["samples_added"] += 1
+
+    # The shared registry is only touched for samples that are kept
+    type_list.setdefault(k, []).append(val)
     seen.add(fp)
+    if _sample_store is not None:
+        # Serialized once, at capture time
+        _sample_store.add(k, fp, val)
+
+
+def export_samples(samples: dict) -> dict:
+    """
+    Samples (as returned by `samples_since`) in a form another process can
+    merge with `import_samples`: {type_key: [(fingerprint, pickled value)]}.
+    Values that cannot be pickled are left out.
+    """
+    out = {}
+    for k, vals in samples.items():
+        fp_cache = {}
+        for v in vals:
+            try:
+                data = pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                continue
+            out.setdefault(k, []).append((_fingerprint(v, fp_cache), data))
+    return out
+
+
+def import_samples(exported: dict) -> dict:
+    """
+    Merge samples exported by another process into `type_list`, with the
+    same per-type cap and fingerprint dedup as `_add_type_sample`.
+
+    :return: the samples that were new, {type_key: [value]}
+    """
+    accepted = {}
+    for k, items in exported.items():
+        bucket = type_list.setdefault(k, [])
+        seen = _type_seen.setdefault(k, set())
+        for fp, data in items:
+            if len(seen) >= MAX_SAMPLES_PER_TYPE:
+                break
+            if fp in seen:
+                continue
+            try:
+                val = pickle.loads(data)
+            except Exception:
+                continue
+            bucket.append(val)
+            seen.add(fp)
+            accepted.setdefault(k, []).append(val)
+            if _sample_store is not None:
+                _sample_store.add_bytes(k, fp, data)
+    return accepted
+
+
+def load_type_list(t_list: dict) -> int:
+    """
+    Add the samples of a classic `type_list` dict (e.g. an old
+    type_list.pkl) with the same per-type cap and fingerprint dedup as
+    `_add_type_sample`, persisting them to the attached store.
+
+    :return: the number of samples added
+    """
+    added = 0
+    for k, vals in t_list.items():
+        bucket = type_list.setdefault(k, [])
+        seen = _type_seen.setdefault(k, set())
+        fp_cache = {}
+        for val in vals:
+            if len(seen) >= MAX_SAMPLES_PER_TYPE:
+                break
+            fp = _fingerprint(val, fp_cache)
+            if fp in seen:
+                continue
+            bucket.append(val)
+            seen.add(fp)
+            added += 1
+            if _sample_store is not None:
+                _sample_store.add(k, fp, val)
+    return added
+
+
+def sample_counts() -> dict:
+    """Current number of samples per type key, for use with `samples_since`."""
+    return {k: len(v) for k, v in type_list.items()}
+
+
+def samples_since(counts: dict) -> dict:
+    """Samples added to `type_list` after `counts` was taken."""
+    return {k: v[counts.get(k, 0):] for k, v in type_list.items() if len(v) > counts.get(k, 0)}
 
 
 def resolve_by_dotted_name(dotted: str):
@@ -131,98 +389,373 @@ def dump_type_list_to_json(type_list, path="type_list.json"):
         )
 
 
-def run(f_name, params=[]) -> dict:
-    '''
-    Run function with given parameters and get type samples
+# ----------------------------
+# Assignment-driven capture
+# ----------------------------
+_STORE_OPS = {"STORE_FAST", "STORE_NAME", "STORE_DEREF", "STORE_FAST_MAYBE_NULL", "STORE_FAST_STORE_FAST"}
+_DELETE_OPS = {"DELETE_FAST", "DELETE_NAME", "DELETE_DEREF"}
 
-    :param f_name: function name from function list
-    :param params: parameters to run with
+# code object -> {line: (names stored on that line, names deleted on that line)}
+_store_plans = weakref.WeakKeyDictionary()
 
-    :return: type list
-    '''
 
+def _store_plan(code) -> dict:
+    """
+    Precompute, from the bytecode, which locals each line of `code` binds or
+    unbinds. Computed once per code object.
+    """
+    plan = _store_plans.get(code)
+    if plan is not None:
+        return plan
+
+    stores, deletes = defaultdict(set), defaultdict(set)
+    line = code.co_firstlineno
+    for ins in dis.get_instructions(code):
+        positions = getattr(ins, "positions", None)
+        if positions is not None and positions.lineno is not None:
+            line = positions.lineno
+        elif type(ins.starts_line) is int:
+            # Python 3.10 only marks the first instruction of each line
+            line = ins.starts_line
+
+        if ins.opname in _STORE_OPS:
+            names = ins.argval if isinstance(ins.argval, tuple) else (ins.argval,)
+            stores[line].update(names)
+        elif ins.opname == "STORE_FAST_LOAD_FAST":
+            stores[line].add(ins.argval[0])
+        elif ins.opname in _DELETE_OPS:
+            deletes[line].add(ins.argval)
+
+    plan = {
+        ln: (frozenset(stores.get(ln, ())), frozenset(deletes.get(ln, ())))
+        for ln in stores.keys() | deletes.keys()
+    }
+    _store_plans[code] = plan
+    return plan
 
-    if params is None:
-        params = []
 
-    target_fn = resolve_by_dotted_name(f_name)
+# ----------------------------
+# Code-object allowlist
+# ----------------------------
+class _CapturePlan(NamedTuple):
+    """What to sample when a frame of an allowlisted code object starts."""
+    qualname: str | None  # function list entry, None for other project code
+    argnames: tuple
+    varargs: str | None
+    kwargs: str | None
+
+    @property
+    def params(self) -> list[tuple[str, str]]:
+        """(local name, function list param name) of every argument."""
+        params = [(name, name) for name in self.argnames]
+        if self.varargs is not None:
+            params.append((self.varargs, "*" + self.varargs))
+        if self.kwargs is not None:
+            params.append((self.kwargs, "**" + self.kwargs))
+        return params
+
+
+# (id, len, generation) of the function list the allowlist was built from, and
+# normalized filename -> {def line: qualname}
+_allowlist_key = None
+_allowlist = {}
+# code object -> _CapturePlan, or None for code that is never traced
+_capture_plans = weakref.WeakKeyDictionary()
+
+
+def _norm_path(path: str) -> str:
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _library_dirs() -> tuple[str, ...]:
+    paths = sysconfig.get_paths()
+    dirs = [paths.get("stdlib"), paths.get("platstdlib"), paths.get("purelib"), paths.get("platlib")]
+    try:
+        dirs += site.getsitepackages() + [site.getusersitepackages()]
+    except AttributeError:
+        # Old virtualenvs ship a site module without these
+        pass
+    return tuple({_norm_path(d) + os.sep for d in dirs if d})
 
-    # Track frames descended from this run call
-    tracked_frames = set()
-    locals_seen_keys = {}  # id(frame) -> set(keys)
 
-    def tracer(frame, event, arg):
-        if event == "call":
-            code = frame.f_code
-            callee_name = code.co_name
-
-            # Start tracking once we enter target function; then include children
-            is_target_entry = (callee_name == target_fn.__name__ and frame.f_code is target_fn.__code__)
-            is_child_of_tracked = (frame.f_back in tracked_frames)
-
-            if is_target_entry or is_child_of_tracked:
-                tracked_frames.add(frame)
-                locals_seen_keys[id(frame)] = set(frame.f_locals.keys())
-                function_list = get_function_list()
-                # Only update function_list for functions we care about
-                if callee_name in function_list:
-                    # Record params with inspect signature binding
-                    try:
-                        sig = inspect.signature(frame.f_globals.get(callee_name, None) or target_fn)
-                    except Exception:
-                        sig = None
+# Installed code (stdlib, site-packages) is only traced when listed
+_LIBRARY_DIRS = _library_dirs()
 
-                    try:
-                        # Build call args mapping from frame locals using inspect.getargvalues
-                        args_info = inspect.getargvalues(frame)
-                        argmap = {}
-
-                        for p in args_info.args:
-                            if p in args_info.locals:
-                                argmap[p] = args_info.locals[p]
-                        if args_info.varargs and args_info.varargs in args_info.locals:
-                            argmap[args_info.varargs] = args_info.locals[args_info.varargs]
-                        if args_info.keywords and args_info.keywords in args_info.locals:
-                            argmap[args_info.keywords] = args_info.locals[args_info.keywords]
-
-                        # Update counters + samples
-                        for p, v in argmap.items():
-                            _add_type_sample(v)
 
-                    except Exception:
-                        # If anything fails, still keep tracing
-                        pass
+def _is_project_file(filename: str) -> bool:
+    """False for stdlib, site-packages and generated (`<string>`, frozen) code."""
+    if filename.startswith("<"):
+        return False
+    path = _norm_path(filename)
+    if path.startswith(_LIBRARY_DIRS):
+        return False
+    parts = path.split(os.sep)
+    return "site-packages" not in parts and "dist-packages" not in parts
 
-            return tracer
 
-        if frame in tracked_frames:
-            if event == "line":
-                # Best-effort: detect newly created locals
-                cur_keys = set(frame.f_locals.keys())
-                prev_keys = locals_seen_keys.get(id(frame), set())
-                new_keys = cur_keys - prev_keys
-                locals_seen_keys[id(frame)] = cur_keys
+def _refresh_allowlist(function_list: dict) -> None:
+    """Rebuild the filename/line table when the function list changed."""
+    global _allowlist_key, _allowlist
+    key = (id(function_list), len(function_list), getattr(function_list, "generation", None))
+    if key == _allowlist_key:
+        return
+
+    table = {}
+    for qualname, info in function_list.items():
+        filename = info.get("filename") if isinstance(info, dict) else None
+        if filename:
+            table.setdefault(_norm_path(filename), {})[info.get("lineno", 0)] = qualname
+    _allowlist_key, _allowlist = key, table
+    _capture_plans.clear()
+
+
+def _capture_plan(code) -> _CapturePlan | None:
+    """
+    Cached capture plan of `code`, or None if it does not belong to the
+    target project (stdlib, site-packages, ...). Files of the function list
+    make up the project; files it does not mention (or every file, when it
+    records none) count as project code unless they are installed.
+    """
+    try:
+        return _capture_plans[code]
+    except KeyError:
+        pass
+
+    lines = _allowlist.get(_norm_path(code.co_filename))
+    plan = None
+    if lines is not None:
+        # The function list records the `def` line; co_firstlineno is the
+        # first decorator line of decorated functions
+        first = code.co_firstlineno
+        body = [ln for _, _, ln in code.co_lines() if ln is not None and ln > first]
+        qualname = None
+        for ln in range(first, min(body, default=first) + 1):
+            q = lines.get(ln)
+            if q is not None and q.rsplit(".", 1)[-1] == code.co_name:
+                qualname = q
+                break
+        plan = _plan_for_code(code, qualname)
+    elif _is_project_file(code.co_filename):
+        plan = _plan_for_code(code, None)
+
+    _capture_plans[code] = plan
+    return plan
+
+
+# Generators and coroutines report every resume as a call
+_RESUMABLE = inspect.CO_GENERATOR | inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
+# code object -> offset of its first RESUME instruction (-1 before 3.11)
+_start_offsets = weakref.WeakKeyDictionary()
+
+
+def _is_resume(frame) -> bool:
+    """True if a call event of `frame` resumes a suspended generator or coroutine."""
+    code = frame.f_code
+    if not code.co_flags & _RESUMABLE:
+        return False
+    start = _start_offsets.get(code)
+    if start is None:
+        start = next((ins.offset for ins in dis.get_instructions(code) if ins.opname == "RESUME"), -1)
+        _start_offsets[code] = start
+    return frame.f_lasti > start
+
+
+def _plan_for_code(code, qualname: str | None) -> _CapturePlan:
+    nargs = code.co_argcount + code.co_kwonlyargcount
+    names = code.co_varnames
+    varargs = kwargs = None
+    if code.co_flags & inspect.CO_VARARGS:
+        varargs = names[nargs]
+    if code.co_flags & inspect.CO_VARKEYWORDS:
+        kwargs = names[nargs + (varargs is not None)]
+    return _CapturePlan(qualname, names[:nargs], varargs, kwargs)
+
+
+class _FrameTracker:
+    """
+    Backend-independent bookkeeping for one `run` call: which frames descend
+    from the target function and which of their locals were already sampled.
+    """
 
-                for k in new_keys:
+    def __init__(self, target_fn, capture: str = "assign"):
+        self.target_fn = target_fn
+        self.target_code = target_fn.__code__
+        self.capture = capture
+        _refresh_allowlist(get_function_list())
+        # The target is traced even when it lies outside the function list
+        self.target_plan = _capture_plan(self.target_code) or _plan_for_code(
+            self.target_code, getattr(target_fn, "__qualname__", target_fn.__name__)
+        )
+        self.tracked_frames = set()
+        self.locals_seen_keys = {}  # id(frame) -> set(keys)
+        self.last_line = {}  # id(frame) -> line of the previous line event
+        self.store_plans = {}  # id(frame) -> store plan of its code
+        self.disabled_stores = {}  # code -> names stored on lines that no longer report
+        self.param_stats = defaultdict(int)  # (qualname, param, type_key) -> calls
+        # Tracer events handled, reported by profiling
+        self.call_events = self.line_events = self.return_events = 0
+
+    def on_call(self, frame, resumed: bool | None = None) -> _CapturePlan | None:
+        """
+        Handle a function entry. Returns the capture plan of the frame if it
+        is tracked, None if it is not (and never will be, unless it is the
+        target itself).
+
+        :param resumed: the frame is a generator or coroutine resuming, so
+            its arguments were already counted; None detects it from the frame
+        """
+        self.call_events += 1
+        code = frame.f_code
+        if code is self.target_code:
+            plan = self.target_plan
+        else:
+            plan = _capture_plan(code)
+            if plan is None:
+                return None
+            # Tracked while the target runs, also when called back through
+            # untracked library frames (sorted(key=...), map, ...)
+            caller = frame.f_back
+            while caller is not None and caller not in self.tracked_frames:
+                caller = caller.f_back
+            if caller is None:
+                return None
+
+        fid = id(frame)
+        self.tracked_frames.add(frame)
+        f_locals = frame.f_locals
+        self.locals_seen_keys[fid] = set(f_locals.keys())
+        self.last_line[fid] = None
+        if self.capture == "assign":
+            self.store_plans[fid] = _store_plan(code)
+
+        # Only functions of the function list get their arguments sampled,
+        # once per call
+        if resumed is None:
+            resumed = _is_resume(frame)
+        if plan.qualname is not None and not resumed:
+            fp_cache = {}
+            param_stats = self.param_stats
+            for name, param in plan.params:
+                if name in f_locals:
                     try:
-                        _add_type_sample(frame.f_locals[k])
+                        val = f_locals[name]
+                        param_stats[(plan.qualname, param, type_key(val))] += 1
+                        _add_type_sample(val, fp_cache)
                     except Exception:
+                        # If anything fails, still keep tracing
                         pass
 
-            elif event == "return":
-                # Sample return value + final locals snapshot
-                try:
-                    _add_type_sample(arg)
-                except Exception:
-                    pass
+        return plan
+
+    def is_allowed(self, code) -> bool:
+        return code is self.target_code or _capture_plan(code) is not None
+
+    def on_line(self, frame) -> int:
+        """Sample newly created locals. Returns the number of new keys seen."""
+        self.line_events += 1
+        if self.capture == "assign":
+            return self._on_line_assign(frame)
+
+        # Best-effort: detect newly created locals
+        cur_keys = set(frame.f_locals.keys())
+        prev_keys = self.locals_seen_keys.get(id(frame), set())
+        new_keys = cur_keys - prev_keys
+        self.locals_seen_keys[id(frame)] = cur_keys
+
+        fp_cache = {}
+        for k in new_keys:
+            try:
+                _add_type_sample(frame.f_locals[k], fp_cache)
+            except Exception:
+                pass
+        return len(new_keys)
+
+    def _on_line_assign(self, frame) -> int:
+        """
+        Sample only the locals bound by the line that just finished, as
+        listed by its store plan. Lines that re-assign already bound names
+        (the common case in loops) never materialize `frame.f_locals`.
+        """
+        fid = id(frame)
+        last_line = self.last_line
+        entry = self.store_plans[fid].get(last_line.get(fid))
+        last_line[fid] = frame.f_lineno
+
+        pending = self.disabled_stores.get(frame.f_code) if self.disabled_stores else None
+        if entry is None:
+            if not pending:
+                return 0
+            entry = (frozenset(), frozenset())
+        stores, deletes = entry
+        bound = self.locals_seen_keys[fid]
+        new_keys = stores - bound
+        if pending:
+            new_keys |= pending - bound
+        if not new_keys and not (deletes & bound):
+            return 0
+
+        f_locals = frame.f_locals
+        # A deleted name is sampled again when it is re-bound
+        bound.difference_update([k for k in deletes if k not in f_locals])
+
+        fp_cache = {}
+        count = 0
+        for k in new_keys:
+            if k not in f_locals:
+                continue
+            bound.add(k)
+            count += 1
+            try:
+                _add_type_sample(f_locals[k], fp_cache)
+            except Exception:
+                pass
+        return count
+
+    def line_binds_names(self, code, line) -> bool:
+        return line in _store_plan(code)
+
+    def line_disabled(self, code, line) -> None:
+        """
+        A backend stopped reporting `line`. Its stores are then checked at
+        every later line event of the same code until they are bound.
+        """
+        entry = _store_plan(code).get(line)
+        if entry and entry[0]:
+            self.disabled_stores[code] = self.disabled_stores.get(code, frozenset()) | entry[0]
+
+    def on_return(self, frame, retval) -> None:
+        self.return_events += 1
+        # Sample return value + final locals snapshot
+        fp_cache = {}
+        try:
+            _add_type_sample(retval, fp_cache)
+        except Exception:
+            pass
+
+        try:
+            for _, v in frame.f_locals.items():
+                _add_type_sample(v, fp_cache)
+        except Exception:
+            pass
+
+        self.tracked_frames.discard(frame)
+        self.last_line.pop(id(frame), None)
+        self.store_plans.pop(id(frame), None)
 
-                try:
-                    for _, v in frame.f_locals.items():
-                        _add_type_sample(v)
-                except Exception:
-                    pass
 
-                tracked_frames.discard(frame)
+def _run_settrace(state: _FrameTracker, params) -> None:
+    target_fn = state.target_fn
+
+    def tracer(frame, event, arg):
+        if event == "call":
+            # Frames outside the allowlist are not traced locally at all
+            return tracer if state.on_call(frame) is not None else None
+
+        if frame in state.tracked_frames:
+            if event == "line":
+                state.on_line(frame)
+            elif event == "return":
+                state.on_return(frame, arg)
 
         return tracer
 
@@ -230,8 +763,165 @@ def run(f_name, params=[]) -> dict:
     sys.settrace(tracer)
     try:
         target_fn(*params)
-        dump_type_list_to_json(type_list)
-        print(type_list)
-        return type_list
     finally:
         sys.settrace(old_trace)
+
+
+# A LINE location that produced no new sample this many times in a row
+# is disabled for the rest of the run (sys.monitoring backend only)
+LINE_DISABLE_AFTER = 8
+
+
+def _acquire_monitoring_tool() -> int | None:
+    mon = sys.monitoring
+    for tool_id in (mon.PROFILER_ID, 3, 4, mon.OPTIMIZER_ID):
+        if mon.get_tool(tool_id) is None:
+            mon.use_tool_id(tool_id, "soe")
+            return tool_id
+    return None
+
+
+def _run_monitoring(state: _FrameTracker, params, tool_id: int) -> None:
+    """
+    PEP 669 backend. Only entry and unwind events are enabled globally; LINE
+    and return events are switched on per code object once a frame of that
+    code is tracked, and LINE locations that stop yielding samples are disabled.
+    Samples go to `type_list` exactly as in the settrace backend.
+    """
+    mon = sys.monitoring
+    events = mon.events
+    target_fn = state.target_fn
+    assign = state.capture == "assign"
+
+    local_events = events.LINE | events.PY_RETURN | events.PY_YIELD
+    instrumented = set()
+    idle_hits = {}  # (code, line) -> consecutive LINE hits without new samples
+
+    def start(frame, code, resumed):
+        if state.on_call(frame, resumed) is None:
+            if not state.is_allowed(code):
+                # Never traced: stop reporting starts of this code at all
+                return mon.DISABLE
+            return
+        if code not in instrumented:
+            mon.set_local_events(tool_id, code, local_events)
+            instrumented.add(code)
+
+    def on_start(code, offset):
+        return start(sys._getframe(1), code, False)
+
+    def on_resume(code, offset):
+        return start(sys._getframe(1), code, True)
+
+    def on_line(code, line):
+        frame = sys._getframe(1)
+        if frame not in state.tracked_frames:
+            return
+        new_keys = state.on_line(frame)
+        if assign and not state.line_binds_names(code, line):
+            # Lines that bind nothing never need another event
+            return mon.DISABLE
+        # A disabled location is caught up at the next line, by the key diff
+        # or by the pending stores of disabled lines
+        if new_keys:
+            idle_hits.pop((code, line), None)
+            return
+        hits = idle_hits.get((code, line), 0) + 1
+        idle_hits[(code, line)] = hits
+        if hits >= LINE_DISABLE_AFTER:
+            if assign:
+                state.line_disabled(code, line)
+            return mon.DISABLE
+
+    def on_return(code, offset, retval):
+        frame = sys._getframe(1)
+        if frame in state.tracked_frames:
+            state.on_return(frame, retval)
+
+    def on_unwind(code, offset, exc):
+        # settrace reports an exception exit as a return of None
+        frame = sys._getframe(1)
+        if frame in state.tracked_frames:
+            state.on_return(frame, None)
+
+    callbacks = {
+        events.PY_START: on_start,
+        events.PY_RESUME: on_resume,
+        events.LINE: on_line,
+        events.PY_RETURN: on_return,
+        events.PY_YIELD: on_return,
+        events.PY_UNWIND: on_unwind,
+    }
+    for event, callback in callbacks.items():
+        mon.register_callback(tool_id, event, callback)
+
+    # Re-enable locations disabled by a previous run
+    mon.restart_events()
+    # PY_UNWIND cannot be enabled per code object
+    mon.set_events(tool_id, events.PY_START | events.PY_RESUME | events.PY_UNWIND)
+    try:
+        target_fn(*params)
+    finally:
+        mon.set_events(tool_id, 0)
+        for code in instrumented:
+            mon.set_local_events(tool_id, code, 0)
+        for event in callbacks:
+            mon.register_callback(tool_id, event, None)
+        mon.free_tool_id(tool_id)
+
+
+def has_monitoring() -> bool:
+    return hasattr(sys, "monitoring")
+
+
+def run(f_name, params=[], backend="auto", capture="assign") -> dict:
+    '''
+    Run function with given parameters and get type samples
+
+    :param f_name: function name from function list
+    :param params: parameters to run with
+    :param backend: "settrace", "monitoring" (Python 3.12+) or "auto"
+    :param capture: "assign" samples a local right after the bytecode
+        assigns it, "diff" diffs `frame.f_locals` on every line
+
+    :return: type list
+    '''
+
+
+    if params is None:
+        params = []
+
+    profiler = profiling.current()
+    samples_before = dict(sample_stats) if profiler is not None else None
+    start = time.perf_counter()
+    target_fn = resolve_by_dotted_name(f_name)
+    imported = time.perf_counter()
+
+    if backend == "auto":
+        backend = "monitoring" if has_monitoring() else "settrace"
+    if backend == "monitoring" and not has_monitoring():
+        logger.warning("sys.monitoring is not available, falling back to settrace")
+        backend = "settrace"
+
+    tool_id = _acquire_monitoring_tool() if backend == "monitoring" else None
+    if backend == "monitoring" and tool_id is None:
+        logger.warning("No free sys.monitoring tool id, falling back to settrace")
+
+    state = _FrameTracker(target_fn, capture)
+    try:
+        if tool_id is not None:
+            _run_monitoring(state, params, tool_id)
+        else:
+            _run_settrace(state, params)
+    finally:
+        # Argument types seen, also when the target raised
+        add_param_stats(state.param_stats)
+        if profiler is not None:
+            profiler.record_target(f_name, imported - start, time.perf_counter() - imported)
+            profiler.count("tracer.call_events", state.call_events)
+            profiler.count("tracer.line_events", state.line_events)
+            profiler.count("tracer.return_events", state.return_events)
+            for k, n in sample_stats.items():
+                profiler.count(f"samples.{k}", n - samples_before[k])
+
+    return type_list
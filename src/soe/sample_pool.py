@@ -0,0 +1,85 @@
+import copy
+import pickle
+import random
+import logging
+
+logger = logging.getLogger('sample_pool')
+
+
+# Values of these types are never mutated, so they are handed out as-is
+IMMUTABLE_TYPES = (int, float, complex, bool, str, bytes, type(None), frozenset, range)
+
+# Seed of the draws, so a fuzz campaign over the same samples is reproducible
+DEFAULT_SEED = 0
+
+
+class SamplePool:
+    """
+    Fuzz inputs drawn from harvested type samples.
+
+    `type_list` is read live, so samples captured while fuzzing become
+    inputs for the functions that run later. Every draw returns a private
+    copy: a sample is pickled once, on first use, and unpickled for every
+    draw, so a target that mutates its arguments cannot corrupt the pool.
+    Draws come from a `random.Random(seed)` of their own.
+    """
+
+    def __init__(self, type_list: dict, seed: int = DEFAULT_SEED):
+        self.type_list = type_list
+        self.rng = random.Random(seed)
+        self._blobs: dict[tuple[str, int], bytes | None] = {}
+
+    def __bool__(self) -> bool:
+        return any(self.type_list.values())
+
+    def clone(self, type_key: str, i: int):
+        val = self.type_list[type_key][i]
+        if isinstance(val, IMMUTABLE_TYPES):
+            return val
+        if isinstance(val, tuple) and all(isinstance(v, IMMUTABLE_TYPES) for v in val):
+            return val
+
+        blob = self._blobs.get((type_key, i), b"")
+        if blob == b"":
+            try:
+                blob = pickle.dumps(val, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                blob = None
+            self._blobs[(type_key, i)] = blob
+        if blob is not None:
+            return pickle.loads(blob)
+        try:
+            return copy.deepcopy(val)
+        except Exception:
+            # Neither picklable nor copyable: shared, at the target's mercy
+            return val
+
+    def _candidate_keys(self, param: str, type_counts: dict) -> list[str]:
+        keys = [k for k, v in self.type_list.items() if v]
+        # Types the parameter is known to accept
+        known = [k for k in keys if type_counts.get(k)]
+        if known:
+            return known
+        # `graph` is likely a ...Graph, `node` a ...Node
+        name = param.lower().strip("_")
+        named = [k for k in keys if name and name in k.rsplit(".", 1)[-1].lower()]
+        return named or keys
+
+    def draw(self, param: str, type_counts: dict | None = None):
+        """One input for `param`. Raises LookupError if the pool is empty."""
+        keys = self._candidate_keys(param, type_counts or {})
+        if not keys:
+            raise LookupError("sample pool is empty")
+        k = self.rng.choice(keys)
+        return self.clone(k, self.rng.randrange(len(self.type_list[k])))
+
+    def args_for(self, params: dict) -> list | None:
+        """
+        Positional arguments for a function record's `params`
+        (param -> {type: count}); None if the pool cannot provide them.
+        """
+        names = [p for p in params if not p.startswith("*") and p not in ("self", "cls")]
+        try:
+            return [self.draw(p, params[p]) for p in names]
+        except LookupError:
+            return None
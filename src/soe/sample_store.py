@@ -0,0 +1,197 @@
+import os
+import json
+import mmap
+import pickle
+import shutil
+import logging
+from pathlib import Path
+from typing import Any, Iterator
+
+from soe.result_log import _repair_tail
+
+logger = logging.getLogger('sample_store')
+
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+INDEX_FILE = "index.jsonl"
+
+
+class SampleStore:
+    """
+    Segmented on-disk store for type samples.
+
+    Every sample is pickled exactly once, when it is captured, and appended
+    to the current segment file (`seg-00000.bin`, ...). A new segment starts
+    once the current one reaches `segment_size` bytes. `index.jsonl` gets one
+    line per sample with its type key, fingerprint and location, so opening
+    a store only reads the index; values are unpickled on demand from
+    memory-mapped segments.
+    """
+
+    def __init__(self, path: Path, truncate: bool = False, segment_size: int = SEGMENT_SIZE):
+        self.path = Path(path)
+        self.segment_size = segment_size
+        if truncate and self.path.exists():
+            shutil.rmtree(self.path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not truncate:
+            # New index lines must not be glued to one torn by a crash
+            _repair_tail(self.path / INDEX_FILE)
+
+        # type_key -> list of (fingerprint, segment, offset, length)
+        self.index: dict[str, list[tuple[str, int, int, int]]] = {}
+        self._fingerprints: dict[str, set[str]] = {}
+        self._maps: dict[int, mmap.mmap] = {}
+        self._files: dict[int, Any] = {}
+
+        self._segment = 0
+        self._load_index()
+        self._writer = open(self._segment_path(self._segment), "ab")
+        self._index_writer = open(self.path / INDEX_FILE, "a", encoding="utf-8")
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.path / f"seg-{segment:05d}.bin"
+
+    def _load_index(self) -> None:
+        index_path = self.path / INDEX_FILE
+        if not index_path.exists():
+            return
+
+        sizes: dict[int, int] = {}
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    key, fp, seg, off, n = rec["k"], rec["f"], rec["s"], rec["o"], rec["n"]
+                except (ValueError, KeyError):
+                    # Torn write at the end of an interrupted run
+                    continue
+                if seg not in sizes:
+                    try:
+                        sizes[seg] = os.path.getsize(self._segment_path(seg))
+                    except OSError:
+                        sizes[seg] = 0
+                if off + n > sizes[seg]:
+                    continue
+                self.index.setdefault(key, []).append((fp, seg, off, n))
+                self._fingerprints.setdefault(key, set()).add(fp)
+                self._segment = max(self._segment, seg)
+
+    # --- writing ---
+
+    def add(self, type_key: str, fingerprint: str, value: Any) -> bool:
+        """Serialize and append one sample. Returns False if it was not stored."""
+        seen = self._fingerprints.setdefault(type_key, set())
+        if fingerprint in seen:
+            return False
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        return self.add_bytes(type_key, fingerprint, data)
+
+    def add_bytes(self, type_key: str, fingerprint: str, data: bytes) -> bool:
+        """Append an already pickled sample."""
+        seen = self._fingerprints.setdefault(type_key, set())
+        if fingerprint in seen:
+            return False
+
+        offset = self._writer.tell()
+        if offset and offset + len(data) > self.segment_size:
+            self._writer.close()
+            self._segment += 1
+            self._writer = open(self._segment_path(self._segment), "ab")
+            offset = 0
+
+        self._writer.write(data)
+        self.index.setdefault(type_key, []).append((fingerprint, self._segment, offset, len(data)))
+        seen.add(fingerprint)
+        self._index_writer.write(json.dumps(
+            {"k": type_key, "f": fingerprint, "s": self._segment, "o": offset, "n": len(data)},
+            separators=(",", ":")
+        ) + "\n")
+        return True
+
+    def flush(self) -> None:
+        # Segment data must hit the disk before the index lines pointing at it
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._index_writer.flush()
+        os.fsync(self._index_writer.fileno())
+
+    def close(self) -> None:
+        if self._writer.closed:
+            return
+        self.flush()
+        self._writer.close()
+        self._index_writer.close()
+        for m in self._maps.values():
+            try:
+                m.close()
+            except BufferError:
+                pass
+        for f in self._files.values():
+            f.close()
+        self._maps.clear()
+        self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- reading ---
+
+    def keys(self) -> list[str]:
+        return list(self.index)
+
+    def count(self, type_key: str) -> int:
+        return len(self.index.get(type_key, ()))
+
+    def fingerprints(self, type_key: str) -> set[str]:
+        return self._fingerprints.get(type_key, set())
+
+    def _view(self, segment: int, offset: int, length: int) -> memoryview:
+        if segment == self._segment and not self._writer.closed:
+            self._writer.flush()
+        m = self._maps.get(segment)
+        if m is None or len(m) < offset + length:
+            # (Re)map: the active segment grows while we write to it
+            if m is not None:
+                try:
+                    m.close()
+                except BufferError:
+                    # A caller still holds a view, let it keep the old map alive
+                    pass
+            f = self._files.get(segment)
+            if f is None:
+                f = self._files[segment] = open(self._segment_path(segment), "rb")
+            m = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(m)[offset:offset + length]
+
+    def get_bytes(self, type_key: str, i: int) -> memoryview:
+        """Zero-copy view of the pickled bytes of sample `i` of `type_key`."""
+        _, seg, off, n = self.index[type_key][i]
+        return self._view(seg, off, n)
+
+    def load(self, type_key: str, i: int) -> Any:
+        """Unpickle sample `i` of `type_key`, a fresh copy on every call."""
+        view = self.get_bytes(type_key, i)
+        try:
+            return pickle.loads(view)
+        finally:
+            view.release()
+
+    def samples(self, type_key: str) -> Iterator[Any]:
+        """Lazily unpickle the samples of one type key."""
+        for i in range(self.count(type_key)):
+            try:
+                yield self.load(type_key, i)
+            except Exception:
+                # Class no longer importable, etc.
+                continue
+
+    def to_type_list(self) -> dict[str, list]:
+        """Materialize everything as a classic `type_list` dict."""
+        return {k: list(self.samples(k)) for k in self.index}
@@ -0,0 +1,118 @@
+import re
+import json
+import time
+import logging
+from pathlib import Path
+
+logger = logging.getLogger('scheduler')
+
+
+DEFAULT_TIMEOUT = 0.5
+MIN_TIMEOUT = 0.05
+MAX_TIMEOUT = 30.0
+# Headroom over the slowest observed successful run
+TIMEOUT_FACTOR = 4.0
+# A retried target gets this many times its previous timeout
+RETRY_FACTOR = 4.0
+
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Parse `90`, `45s`, `30m`, `1h30m`, `1.5h` into seconds."""
+    text = str(text).strip().lower()
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*([smhd]?)", text)
+    if not parts or re.sub(r"(\d+(?:\.\d+)?)\s*([smhd]?)", "", text).strip():
+        raise ValueError(f"Invalid duration: {text!r}")
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+class AdaptiveTimeouts:
+    """
+    Per-target timeouts learned from observed run times.
+
+    The timeout of a function is `factor` times its slowest successful run;
+    functions that were never observed fall back to the slowest run of their
+    module, then to `default`. A timeout raises the floor of the next one.
+    Statistics can be saved and loaded, so later campaigns start warm.
+    """
+
+    def __init__(
+            self,
+            default: float = DEFAULT_TIMEOUT,
+            min_timeout: float = MIN_TIMEOUT,
+            max_timeout: float = MAX_TIMEOUT,
+            factor: float = TIMEOUT_FACTOR
+        ):
+        self.default = default
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.factor = factor
+        # key -> [slowest successful run, longest timeout hit]
+        self.functions: dict[str, list[float]] = {}
+        self.modules: dict[str, list[float]] = {}
+
+    @staticmethod
+    def _key(module_name: str, class_name: str | None, func_name: str) -> str:
+        return ".".join(p for p in (module_name, class_name, func_name) if p)
+
+    def _clamp(self, t: float) -> float:
+        return min(self.max_timeout, max(self.min_timeout, t))
+
+    def timeout_for(self, module_name: str, class_name: str | None, func_name: str) -> float:
+        slowest, timed_out = self.functions.get(self._key(module_name, class_name, func_name), (0.0, 0.0))
+        if not slowest:
+            # Timeouts of other functions say nothing about this one
+            slowest = self.modules.get(module_name, (0.0, 0.0))[0]
+        t = self.factor * slowest if slowest else self.default
+        return self._clamp(max(t, RETRY_FACTOR * timed_out))
+
+    def observe(self, module_name: str, class_name: str | None, func_name: str, status: str, elapsed: float) -> None:
+        for table, key in ((self.functions, self._key(module_name, class_name, func_name)), (self.modules, module_name)):
+            stats = table.setdefault(key, [0.0, 0.0])
+            if status == "TIMEOUT":
+                stats[1] = max(stats[1], elapsed)
+            else:
+                stats[0] = max(stats[0], elapsed)
+
+    def save(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"functions": self.functions, "modules": self.modules}, f)
+
+    def load(self, path: Path) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.functions.update(data.get("functions", {}))
+        self.modules.update(data.get("modules", {}))
+
+
+class CampaignBudget:
+    """
+    Wall-clock budget of a whole fuzzing campaign, spread evenly over the
+    targets that are still waiting. `seconds=None` means unlimited.
+    """
+
+    def __init__(self, seconds: float | None = None, processes: int = 1):
+        self.seconds = seconds
+        self.processes = max(1, processes)
+        self.start = time.monotonic()
+
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return float("inf")
+        return max(0.0, self.seconds - (time.monotonic() - self.start))
+
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+    def share(self, pending: int) -> float:
+        """Time one target may use when `pending` targets share the rest of the budget."""
+        # `processes` targets run at the same time
+        return self.remaining() * self.processes / max(1, pending)
+
+    def cap(self, timeout: float, pending: int) -> float:
+        """`timeout` limited to the fair share of the remaining budget."""
+        return min(timeout, self.share(pending))
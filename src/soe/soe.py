@@ -4,7 +4,12 @@ import logging, sys
 import pickle
 from soe.function_list.function_list import generate_function_list
 from soe.fuzzer import fuzz
+from soe.sample_store import SampleStore
+from soe.checkpoint import Checkpoint, DEFAULT_INTERVAL, atomic_pickle
+from soe.function_db import FunctionDB
+from soe import profiling
 import soe._global as _global
+import soe.run as run
 
 logger = logging.getLogger('soe')
 
@@ -24,7 +29,7 @@ def main() -> None:
     )
     parser.add_argument(
         "-t", "--type-list-file",
-        help="provide an existing type list file (.pkl)",
+        help="provide an existing sample store directory, or a type list file (.pkl) to import into the output sample store",
         default=""
     )
     parser.add_argument(
@@ -52,6 +57,48 @@ def main() -> None:
         action="store_true",
         help="disable fuzzing"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for parsing and fuzzing (0 uses every core)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="re-parse every file instead of using the AST cache"
+    )
+    parser.add_argument(
+        "--respect-ignores",
+        action="store_true",
+        help="leave tests, examples, build and other commonly ignored directories, and .gitignore'd paths, out of the function list"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the campaign checkpointed in the output directory"
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="seconds between checkpoints"
+    )
+    parser.add_argument(
+        "--db",
+        help="keep the function list and type statistics in this SQLite database",
+        default=""
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every phase and target, and write a hot-path report (profile.txt, profile.json) to the output directory"
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="like --profile, with a cProfile of the whole run (profile.pstats)"
+    )
 
     args = parser.parse_args()
     soe(
@@ -61,7 +108,15 @@ def main() -> None:
         output_dir=Path(args.output),
         no_log=args.no_log,
         no_save=args.no_save,
-        no_fuzz=args.no_fuzz
+        no_fuzz=args.no_fuzz,
+        no_cache=args.no_cache,
+        respect_ignores=args.respect_ignores,
+        jobs=args.jobs,
+        resume=args.resume,
+        checkpoint_interval=args.checkpoint_interval,
+        db_file=Path(args.db) if args.db else None,
+        profile=args.profile,
+        cprofile=args.cprofile
     )
 
 
@@ -84,6 +139,18 @@ def init_logger(level=logging.INFO, no_log=False) -> None:
     )
         
 
+def save_state(output_dir: Path) -> None:
+    """
+    Atomically write function_list.pkl (and call_graph.pkl) to `output_dir`.
+    A function database is already on disk and is not pickled.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if _global.get_function_db() is None:
+        atomic_pickle(output_dir / "function_list.pkl", dict(_global.get_function_list().items()))
+    if _global.get_call_graph() is not None:
+        atomic_pickle(output_dir / "call_graph.pkl", _global.get_call_graph())
+
+
 def soe(
         fuzz_dir: Path, 
         function_list_file: Path = Path(), 
@@ -91,7 +158,15 @@ def soe(
         output_dir: Path = Path("output"), 
         no_log = False,
         no_save = False,
-        no_fuzz = False
+        no_fuzz = False,
+        no_cache = False,
+        respect_ignores = False,
+        jobs = 1,
+        resume = False,
+        checkpoint_interval = DEFAULT_INTERVAL,
+        db_file: Path | None = None,
+        profile = False,
+        cprofile = False
     ) -> None:
     # Initialize logger
     init_logger(no_log=no_log)
@@ -107,55 +182,120 @@ def soe(
         raise NotADirectoryError(f"Provided path {fuzz_dir} must be a directory.")
 
 
+    if profile or cprofile:
+        profiling.enable(cprofile=cprofile)
+
+    # Per-file AST results are cached next to the outputs, so not without them
+    cache_file = None if no_cache or no_save else output_dir / "ast_cache.json"
+
+    # A resumed campaign picks up the function stats of its last checkpoint
+    if resume and function_list_file == Path() and (output_dir / "function_list.pkl").is_file():
+        function_list_file = output_dir / "function_list.pkl"
+
     # Initialize global state
     _global.init_global()
     # Load existing function list if provided
-    if function_list_file.is_file():
-        try:
-            with open(function_list_file, "rb") as f:
-                function_list = pickle.load(f)
+    with profiling.phase("function_list"):
+        if function_list_file.is_file():
+            try:
+                with open(function_list_file, "rb") as f:
+                    function_list = pickle.load(f)
+                    _global.set_function_list(function_list)
+                    logger.info(f"Loaded function list from {function_list_file}")
+                # Function records reference nodes of the call graph saved next to them
+                call_graph_file = function_list_file.with_name("call_graph.pkl")
+                if call_graph_file.is_file():
+                    with open(call_graph_file, "rb") as f:
+                        _global.set_call_graph(pickle.load(f))
+                        logger.info(f"Loaded call graph from {call_graph_file}")
+            except Exception as e:
+                logger.warning(f"Failed to load function list from {function_list_file}: {e}")
+                logger.warning(f"Defaulting to generating new function list")
+                function_list = generate_function_list(fuzz_dir, cache_file=cache_file, jobs=jobs, respect_ignores=respect_ignores)
                 _global.set_function_list(function_list)
-                logger.info(f"Loaded function list from {function_list_file}")
-        except Exception as e:
-            logger.warning(f"Failed to load function list from {function_list_file}: {e}")
-            logger.warning(f"Defaulting to generating new function list")
-            function_list = generate_function_list(fuzz_dir)
+        else:
+            logger.info(f"Generating new function list")
+            function_list = generate_function_list(fuzz_dir, cache_file=cache_file, jobs=jobs, respect_ignores=respect_ignores)
             _global.set_function_list(function_list)
-    else:
-        logger.info(f"Generating new function list")
-        function_list = generate_function_list(fuzz_dir)
-        _global.set_function_list(function_list)
+    # Move the function list into the database, which then backs it
+    function_db = None
+    if db_file is not None:
+        function_db = FunctionDB(db_file)
+        if resume and len(function_db):
+            logger.info(f"Resuming with {len(function_db)} functions from {db_file}")
+        else:
+            with profiling.phase("function_db"):
+                function_db.replace_all(function_list)
+                if _global.get_call_graph() is not None:
+                    function_db.store_call_graph(_global.get_call_graph())
+            logger.info(f"Stored {len(function_db)} functions in {db_file}")
+        _global.set_function_db(function_db)
     # Load existing type list if provided
-    if type_list_file.is_file():
+    sample_store = None
+    imported_type_list = None
+    if type_list_file != Path() and type_list_file.is_dir():
+        # New samples are appended to the given store
+        sample_store = SampleStore(type_list_file)
+        logger.info(f"Opened sample store {type_list_file} ({len(sample_store.keys())} types)")
+    elif type_list_file.is_file():
         try:
-            with open(type_list_file, "rb") as f:
-                type_list = pickle.load(f)
-                _global.set_type_list(type_list)
-                logger.info(f"Loaded type list from {type_list_file}")
+            with open(type_list_file, "rb") as f, profiling.phase("type_list"):
+                imported_type_list = pickle.load(f)
         except Exception as e:
             logger.warning(f"Failed to load type list from {type_list_file}: {e}")
             logger.warning("Defaulting to empty type list")
 
 
+    if sample_store is None and not no_save:
+        sample_store = SampleStore(output_dir / "type_samples", truncate=not resume)
+    # Samples of a resumed or provided store are fuzz inputs again
+    run.attach_sample_store(sample_store, load=True)
+    # A .pkl type list is only an import format, its samples go to the store
+    if imported_type_list is not None:
+        with profiling.phase("type_list"):
+            added = run.load_type_list(imported_type_list)
+        logger.info(f"Imported {added} type samples from {type_list_file}")
+
+    checkpoint = None
+    if not no_save:
+        checkpoint = Checkpoint(output_dir, interval=checkpoint_interval, resume=resume)
+        if sample_store is not None:
+            checkpoint.before_save(sample_store.flush)
+        checkpoint.before_save(lambda: save_state(output_dir))
+        checkpoint.before_save(_global.flush_param_stats)
+
+
     if not no_fuzz:
         try:
             logger.info("Starting fuzzing")
-            fuzz(fuzz_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            with profiling.phase("fuzz"):
+                fuzz(fuzz_dir, output_dir, jobs=jobs, checkpoint=checkpoint)
         except Exception as e:
             logger.critical(f"An error has occurred: {e}")
 
 
     if not no_save:
-        if not output_dir.exists():
-            output_dir.mkdir(parents=True, exist_ok=True)
-
         # Save global state on exit
-        with open(output_dir / "function_list.pkl", "wb") as f:
-            pickle.dump(_global.get_function_list(), f)
+        with profiling.phase("save_state"):
+            save_state(output_dir)
+        if function_db is None:
             logger.info(f"Saved function list to {output_dir / 'function_list.pkl'}")
-        with open(output_dir / "type_list.pkl", "wb") as f:
-            pickle.dump(_global.get_type_list(), f)
-            logger.info(f"Saved type list to {output_dir / 'type_list.pkl'}")
+
+    if function_db is not None:
+        _global.flush_param_stats()
+        function_db.close()
+        logger.info(f"Saved function list to {db_file}")
+
+    # Type samples were written to the store as they were captured
+    run.detach_sample_store()
+    if sample_store is not None:
+        sample_store.close()
+        logger.info(f"Saved type samples to {sample_store.path}")
+
+    profiler = profiling.disable()
+    if profiler is not None:
+        logger.info(f"Wrote profile report to {profiler.write(output_dir)}")
 
     logger.info("Exiting sturdy-octo-engine")
 
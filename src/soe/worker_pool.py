@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+from collections import deque
+import logging
+
+logger = logging.getLogger('worker_pool')
+
+
+DEFAULT_TIMEOUT = 0.5
+DEFAULT_MAX_TASKS_PER_WORKER = 200
+DEFAULT_MAX_RSS_MB = 1024
+
+
+def _rss_bytes() -> int:
+    """Resident set size of the current process in bytes (0 if unknown)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return rss if sys.platform == "darwin" else rss * 1024
+    except Exception:
+        return 0
+
+
+def _worker_main(conn, task_fn, initializer, initargs, max_tasks, max_rss):
+    """
+    Loop of a long-lived worker: receive a task, run it, send the result back.
+
+    Modules imported by `task_fn` stay in `sys.modules`, so consecutive tasks
+    on the same worker skip the import cost. The worker retires itself after
+    `max_tasks` tasks or once its RSS exceeds `max_rss` bytes.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+
+    tasks_done = 0
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+
+        try:
+            result = task_fn(*task)
+            status = "SUCCESS"
+        except Exception:
+            result, status = None, "ERROR"
+
+        tasks_done += 1
+        retire = tasks_done >= max_tasks or (max_rss > 0 and _rss_bytes() > max_rss)
+
+        try:
+            conn.send((status, result, retire))
+        except Exception:
+            # Result could not be pickled
+            conn.send(("ERROR", None, retire))
+
+        if retire:
+            return
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.tasks_done = 0
+
+
+class WorkerPool:
+    """
+    Pool of long-lived worker processes, one per core by default.
+
+    Unlike `multiprocessing.Pool`, every task has its own deadline: a task
+    that runs past it gets its worker terminated and replaced, and the other
+    workers keep going. Workers that crash, finish `max_tasks_per_worker`
+    tasks or grow past `max_rss_mb` are recycled as well.
+
+    Results are `(status, result, elapsed)` tuples where status is one of
+    "SUCCESS", "TIMEOUT", "CRASH" or "ERROR", mirroring `run_safely`.
+    """
+
+    def __init__(
+            self,
+            task_fn,
+            initializer=None,
+            initargs=(),
+            processes: int | None = None,
+            timeout: float = DEFAULT_TIMEOUT,
+            max_tasks_per_worker: int = DEFAULT_MAX_TASKS_PER_WORKER,
+            max_rss_mb: int = DEFAULT_MAX_RSS_MB
+        ):
+        self.task_fn = task_fn
+        self.initializer = initializer
+        self.initargs = initargs
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else 0
+
+        self._workers: list[_Worker] = []
+        self.recycled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        p = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, self.task_fn, self.initializer, self.initargs,
+                  self.max_tasks_per_worker, self.max_rss),
+            daemon=True
+        )
+        p.start()
+        child_conn.close()
+        worker = _Worker(p, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, kill: bool = False) -> None:
+        if kill and worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join()
+        worker.conn.close()
+        self._workers.remove(worker)
+        self.recycled += 1
+
+    def run(self, *task, timeout: float | None = None):
+        """Run a single task and return its `(status, result, elapsed)`."""
+        return self.map([task], timeouts=None if timeout is None else [timeout])[0]
+
+    def map(self, tasks: list[tuple], timeouts: list[float] | None = None) -> list[tuple]:
+        """
+        Run all `tasks` (argument tuples for `task_fn`) across the pool.
+
+        :param tasks: argument tuples, one per task
+        :param timeouts: optional per-task timeout, defaults to `self.timeout`
+
+        :return: list of `(status, result, elapsed)` in the order of `tasks`
+        """
+        results: list = [None] * len(tasks)
+        pending = deque(range(len(tasks)))
+        busy: dict[_Worker, tuple[int, float, float]] = {}  # worker -> (index, start, deadline)
+
+        while pending or busy:
+            # Hand out work to idle workers, spawning new ones up to the limit
+            idle = [w for w in self._workers if w not in busy]
+            while pending and (idle or len(self._workers) < self.processes):
+                worker = idle.pop() if idle else self._spawn()
+                i = pending.popleft()
+                timeout = timeouts[i] if timeouts is not None else self.timeout
+                try:
+                    worker.conn.send(tasks[i])
+                except (OSError, ValueError):
+                    # Worker went away while idle, replace it and retry
+                    self._retire(worker, kill=True)
+                    pending.appendleft(i)
+                    continue
+                start = time.monotonic()
+                busy[worker] = (i, start, start + timeout)
+
+            next_deadline = min(d for _, _, d in busy.values())
+            ready = wait([w.conn for w in busy], timeout=max(0.0, next_deadline - time.monotonic()))
+
+            for worker in [w for w in busy if w.conn in ready]:
+                i, start, _ = busy.pop(worker)
+                elapsed = time.monotonic() - start
+                try:
+                    status, result, retire = worker.conn.recv()
+                except (EOFError, OSError):
+                    # Worker died in the middle of the task
+                    worker.process.join()
+                    status = "SUCCESS" if worker.process.exitcode == 0 else "CRASH"
+                    results[i] = (status, [], elapsed)
+                    self._retire(worker)
+                    continue
+
+                worker.tasks_done += 1
+                results[i] = (status, result if result is not None else [], elapsed)
+                if retire:
+                    self._retire(worker)
+
+            now = time.monotonic()
+            for worker in [w for w, (_, _, d) in busy.items() if d <= now]:
+                i, start, _ = busy.pop(worker)
+                # Kill only the worker that owns the hung task
+                self._retire(worker, kill=True)
+                results[i] = ("TIMEOUT", [], now - start)
+
+        return results
+
+    def close(self) -> None:
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in list(self._workers):
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+        self._workers.clear()
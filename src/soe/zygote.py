@@ -0,0 +1,265 @@
+import os
+import gc
+import time
+import pickle
+import random
+import signal
+import select
+import importlib
+import multiprocessing
+import logging
+from collections import deque
+from soe.worker_pool import DEFAULT_TIMEOUT
+
+logger = logging.getLogger('zygote')
+
+
+def has_fork() -> bool:
+    return hasattr(os, "fork")
+
+
+def _child_main(write_fd, task_fn, task):
+    """Body of a forked child: run one task, write the pickled result, exit."""
+    code = 1
+    try:
+        # Children would otherwise all replay the template's random stream
+        random.seed()
+        try:
+            payload = ("SUCCESS", task_fn(*task))
+        except Exception:
+            payload = ("ERROR", None)
+        try:
+            data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Result could not be pickled
+            data = pickle.dumps(("ERROR", None))
+        with os.fdopen(write_fd, "wb") as f:
+            f.write(data)
+        code = 0
+    finally:
+        # Never fall back into the template's loop (SystemExit and the like
+        # end up here without a result, and are reported as a crash)
+        os._exit(code)
+
+
+class _Child:
+    def __init__(self, task_id, pid, fd, deadline):
+        self.task_id = task_id
+        self.pid = pid
+        self.fd = fd
+        self.start = time.monotonic()
+        self.deadline = deadline
+        self.chunks = []
+
+
+def _reap(pid) -> int:
+    """Wait for `pid`, returns its exit code (negative signal number if killed)."""
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _zygote_main(conn, task_fn, initializer, initargs, preload, processes):
+    """
+    Loop of the template process: warm up once, then fork one child per
+    task, at most `processes` at a time, and report every task as
+    `(task_id, status, result, elapsed)`.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+    for module_name in preload:
+        try:
+            importlib.import_module(module_name)
+        except Exception:
+            # The child reports the import error of its own target
+            pass
+    # Keep the warmed-up heap out of the collector, so forked children do
+    # not touch (and copy) its pages
+    gc.collect()
+    gc.freeze()
+
+    queue = deque()
+    children: dict[int, _Child] = {}  # read fd -> child
+    closing = False
+
+    def finish(child, status, result):
+        del children[child.fd]
+        os.close(child.fd)
+        conn.send((child.task_id, status, result, time.monotonic() - child.start))
+
+    while not closing or queue or children:
+        while queue and len(children) < processes:
+            task_id, task, timeout = queue.popleft()
+            r, w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(r)
+                conn.close()
+                for fd in children:
+                    os.close(fd)
+                _child_main(w, task_fn, task)
+            os.close(w)
+            children[r] = _Child(task_id, pid, r, time.monotonic() + timeout)
+
+        now = time.monotonic()
+        wait_for = min((c.deadline for c in children.values()), default=now + 1.0) - now
+        watched = list(children) + ([] if closing else [conn.fileno()])
+        try:
+            ready, _, _ = select.select(watched, [], [], max(0.0, wait_for))
+        except InterruptedError:
+            continue
+
+        for fd in ready:
+            if fd == conn.fileno():
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    msg = None
+                if msg is None:
+                    closing = True
+                else:
+                    queue.extend(msg)
+                continue
+
+            child = children[fd]
+            data = os.read(fd, 1 << 16)
+            if data:
+                child.chunks.append(data)
+                continue
+            # EOF: the child wrote its result, or died
+            code = _reap(child.pid)
+            try:
+                status, result = pickle.loads(b"".join(child.chunks))
+            except Exception:
+                status, result = ("CRASH" if code != 0 else "ERROR"), None
+            finish(child, status, result)
+
+        now = time.monotonic()
+        for child in [c for c in children.values() if c.deadline <= now]:
+            try:
+                os.kill(child.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            _reap(child.pid)
+            finish(child, "TIMEOUT", None)
+
+        if closing and not children:
+            # Tasks queued behind a shutdown are dropped
+            queue.clear()
+
+
+class ZygotePool:
+    """
+    Fork server: a template process imports the target package once
+    (`preload`), freezes its heap with `gc.freeze()` and then `fork()`s a
+    fresh child for every task. Each target starts from a warm interpreter
+    in milliseconds yet runs in its own process, so crashes, leaked state
+    and timeouts stay isolated exactly as with one process per target.
+
+    Drop-in for `WorkerPool`: `map`/`run` return `(status, result, elapsed)`
+    tuples with the same statuses. POSIX only, see `has_fork`.
+    """
+
+    def __init__(
+            self,
+            task_fn,
+            initializer=None,
+            initargs=(),
+            preload=(),
+            processes: int | None = None,
+            timeout: float = DEFAULT_TIMEOUT
+        ):
+        if not has_fork():
+            raise RuntimeError("ZygotePool needs os.fork")
+        self.task_fn = task_fn
+        self.initializer = initializer
+        self.initargs = initargs
+        self.preload = list(preload)
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.restarts = 0
+
+        self._process = None
+        self._conn = None
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ensure_zygote(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            return
+        if self._process is not None:
+            self.restarts += 1
+            self._conn.close()
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_zygote_main,
+            args=(child_conn, self.task_fn, self.initializer, self.initargs, self.preload, self.processes),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def run(self, *task, timeout: float | None = None):
+        """Run a single task, see `map`."""
+        return self.map([task], timeouts=None if timeout is None else [timeout])[0]
+
+    def map(self, tasks: list[tuple], timeouts: list[float] | None = None) -> list[tuple]:
+        """
+        Run `tasks` (argument tuples for `task_fn`), each in its own forked
+        child, and return their `(status, result, elapsed)` in order.
+
+        :param timeouts: optional per-task timeout, defaults to `self.timeout`
+        """
+        if not tasks:
+            return []
+        self._ensure_zygote()
+
+        ids = {}
+        batch = []
+        for i, task in enumerate(tasks):
+            task_id = self._next_id
+            self._next_id += 1
+            ids[task_id] = i
+            batch.append((task_id, tuple(task), timeouts[i] if timeouts is not None else self.timeout))
+        self._conn.send(batch)
+
+        results: list[tuple | None] = [None] * len(tasks)
+        pending = len(tasks)
+        while pending:
+            try:
+                task_id, status, result, elapsed = self._conn.recv()
+            except (EOFError, OSError):
+                # The template itself died: everything still pending is lost
+                logger.warning("Zygote process died, restarting it")
+                self._process.join(timeout=1)
+                for i, r in enumerate(results):
+                    if r is None:
+                        results[i] = ("CRASH", None, 0.0)
+                self._ensure_zygote()
+                break
+            i = ids.get(task_id)
+            if i is not None and results[i] is None:
+                results[i] = (status, result, elapsed)
+                pending -= 1
+        return results
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._process = None
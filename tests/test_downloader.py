@@ -1,5 +1,6 @@
 import sys
 import os
+from pathlib import Path
 
 from downloader import downloader
 
@@ -10,4 +11,131 @@ def test_main_function_exists():
 def test_import():
     """Test that the module can be imported"""
     from downloader import downloader
-    assert downloader is not None
\ No newline at end of file
+    assert downloader is not None
+
+def _git_env(monkeypatch):
+    for var, value in {
+        "GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@example.com",
+        "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@example.com",
+    }.items():
+        monkeypatch.setenv(var, value)
+
+
+def _upstream(tmp_path, commits):
+    """A bare repository with one commit per (file content) in `commits`. Returns (path, commit ids)."""
+    import git
+    work = git.Repo.init(tmp_path / "work")
+    ids = []
+    for content in commits:
+        (tmp_path / "work" / "mod.py").write_text(content)
+        work.index.add(["mod.py"])
+        ids.append(work.index.commit(f"set {content!r}").hexsha)
+    bare = tmp_path / "upstream.git"
+    git.Repo.clone_from(str(tmp_path / "work"), bare, bare=True)
+    return bare, ids, work
+
+
+def test_checkouts_are_worktrees_of_one_mirror(tmp_path, monkeypatch):
+    import git
+    from downloader.download_repo import clone_and_checkout, mirror_path
+    _git_env(monkeypatch)
+    bare, (first, second), work = _upstream(tmp_path, ["x = 1\n", "x = 2\n"])
+    downloads = tmp_path / "downloads"
+    url = bare.as_uri()
+    # Pull request refs, as GitHub serves them, are not mirrored
+    git.Repo(bare).git.update_ref("refs/pull/1/head", first)
+    git.Repo(bare).git.tag("v1", first)
+
+    clone_and_checkout("proj-1", {"git_url": url, "commit_id": first}, downloads)
+    clone_and_checkout("proj-2", {"git_url": url, "commit_id": second}, downloads)
+    refs = git.Repo(mirror_path(url, downloads)).git.for_each_ref("--format=%(refname)").split()
+    assert "refs/tags/v1" in refs and not [r for r in refs if r.startswith("refs/pull/")]
+    assert (downloads / "proj-1" / "mod.py").read_text() == "x = 1\n"
+    assert (downloads / "proj-2" / "mod.py").read_text() == "x = 2\n"
+    # Checkouts hold no object store of their own
+    assert (downloads / "proj-1" / ".git").is_file() and (downloads / "proj-2" / ".git").is_file()
+    assert [p.name for p in (downloads / ".mirrors").iterdir()] == [mirror_path(url, downloads).name]
+
+    # A commit made upstream later is fetched into the existing mirror
+    (tmp_path / "work" / "mod.py").write_text("x = 3\n")
+    work.index.add(["mod.py"])
+    third = work.index.commit("set 3").hexsha
+    work.git.push(str(bare), f"HEAD:{work.active_branch.name}")
+    clone_and_checkout("proj-1", {"git_url": url, "commit_id": third}, downloads)
+    assert (downloads / "proj-1" / "mod.py").read_text() == "x = 3\n"
+
+    # Checkouts of another mirror are replaced, not checked out in place
+    clone_and_checkout("proj-2", {"git_url": url, "commit_id": third}, downloads, lean=True)
+    assert Path(git.Repo(downloads / "proj-2").common_dir).resolve() == mirror_path(url, downloads, lean=True).resolve()
+    clone_and_checkout("proj-2", {"git_url": url, "commit_id": first}, downloads)
+    assert (downloads / "proj-2" / "mod.py").read_text() == "x = 1\n"
+
+
+def test_download_all_groups_by_url_and_summarizes_failures(tmp_path, monkeypatch):
+    import downloader.download_repo as download_repo
+    _git_env(monkeypatch)
+    bare, (first, second), _ = _upstream(tmp_path / "a", ["a = 1\n", "a = 2\n"])
+    url = bare.as_uri()
+    missing = (tmp_path / "missing.git").as_uri()
+    monkeypatch.setattr(download_repo, "typebugs_repo", {
+        "a-1": {"git_url": url, "commit_id": first},
+        "a-2": {"git_url": url, "commit_id": second},
+    })
+    monkeypatch.setattr(download_repo, "bugsinpy_repo", {
+        "a-3": {"git_url": url, "commit_id": "0" * 40},
+        "gone-1": {"git_url": missing, "commit_id": first},
+    })
+    monkeypatch.setattr(download_repo, "excepy_repo", {"other-1": {"git_url": url, "commit_id": first}})
+    mirrored = []
+    ensure_mirror = download_repo.ensure_mirror
+    monkeypatch.setattr(download_repo, "ensure_mirror", lambda u, *a: mirrored.append(u) or ensure_mirror(u, *a))
+    # Options of another command line must not be picked up
+    monkeypatch.setattr("sys.argv", ["downloader", "-a", "--jobs", "3"])
+
+    downloads = tmp_path / "downloads"
+    failures = download_repo.download_all(match="-", jobs=3, downloads_dir=downloads)
+    assert sorted(failures) == ["a-3", "gone-1"] and "mirroring" in failures["gone-1"]
+    assert failures["a-3"].startswith("fatal:") and "does not appear to be a git repository" in failures["gone-1"]
+    assert sorted(mirrored) == sorted([url, missing])
+    assert (downloads / "a-1" / "mod.py").read_text() == "a = 1\n"
+    assert (downloads / "a-2" / "mod.py").read_text() == "a = 2\n"
+    assert (downloads / "other-1" / "mod.py").read_text() == "a = 1\n"
+
+    assert list(download_repo.all_projects("other")) == ["other-1"]
+
+
+def test_lean_checkout_fetches_only_the_commit(tmp_path, monkeypatch):
+    import git
+    import pytest
+    from downloader.download_repo import clone_and_checkout, has_commit, mirror_path
+    _git_env(monkeypatch)
+    bare, (first, second, third), work = _upstream(tmp_path, ["x = 1\n", "x = 2\n", "x = 3\n"])
+    # A commit only a tag points to
+    work.git.checkout("--detach")
+    (tmp_path / "work" / "mod.py").write_text("x = 4\n")
+    work.index.add(["mod.py"])
+    tagged = work.index.commit("set 4").hexsha
+    work.create_tag("v4")
+    work.git.push(str(bare), "refs/tags/v4")
+    git.Repo(bare).git.config("uploadpack.allowFilter", "true")
+    downloads = tmp_path / "downloads"
+    url = bare.as_uri()
+
+    clone_and_checkout("proj-1", {"git_url": url, "commit_id": second}, downloads, lean=True)
+    assert (downloads / "proj-1" / "mod.py").read_text() == "x = 2\n"
+    mirror = git.Repo(mirror_path(url, downloads, lean=True))
+    assert mirror.git.rev_parse("--is-shallow-repository") == "true"
+    assert not has_commit(mirror, first) and not has_commit(mirror, third)
+
+    # Abbreviated ids cannot be fetched alone: partial clone, blobs fetched on checkout
+    clone_and_checkout("proj-2", {"git_url": url, "commit_id": first[:12]}, downloads, lean=True)
+    assert (downloads / "proj-2" / "mod.py").read_text() == "x = 1\n"
+    assert mirror.git.config("remote.origin.partialclonefilter") == "blob:none"
+    assert not mirror_path(url, downloads).exists()
+    clone_and_checkout("proj-3", {"git_url": url, "commit_id": tagged[:12]}, downloads, lean=True)
+    assert (downloads / "proj-3" / "mod.py").read_text() == "x = 4\n"
+
+    # An id the upstream does not have fails before adding a worktree
+    with pytest.raises(ValueError, match="not on any branch or tag"):
+        clone_and_checkout("proj-4", {"git_url": url, "commit_id": "0123456789ab"}, downloads, lean=True)
+    assert not (downloads / "proj-4").exists()
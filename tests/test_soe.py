@@ -5,6 +5,38 @@ import pytest
 
 from soe import soe
 
+
+@pytest.fixture
+def traced_module(tmp_path, monkeypatch):
+	"""
+	Factory writing a module to tmp_path/src, which is put on the import
+	path, and listing the functions given as `name=params` keywords. Runs
+	start from an empty type list; the function list is restored afterwards.
+	"""
+	import soe._global as _global
+	from soe import run
+
+	src = tmp_path / "src"
+	src.mkdir()
+	monkeypatch.syspath_prepend(str(src))
+	saved = dict(_global.get_function_list().items())
+	run.type_list.clear()
+	run._type_seen.clear()
+
+	def write(name: str, source: str, **functions) -> Path:
+		path = src / f"{name}.py"
+		path.write_text(source)
+		lines = source.splitlines()
+		for f_name, params in functions.items():
+			lineno = next(i for i, line in enumerate(lines, 1) if line.startswith(f"def {f_name}("))
+			_global.set_function(f"{name}.{f_name}", {"params": params, "filename": str(path), "lineno": lineno})
+		return path
+
+	yield write
+	_global.set_function_list(saved)
+	run.type_list.clear()
+	run._type_seen.clear()
+
 def test_main_function_exists():
     """Test that main function exists"""
     assert callable(soe.soe)
@@ -19,3 +51,706 @@ def test_soe():
 		soe.soe(Path("downloads/numpy-8"),)
 	except Exception as e:
 		assert False, f"soe.soe raised an exception: {e}"
+
+
+def test_worker_pool_timeout_kills_only_its_worker():
+	import time
+	from soe.worker_pool import WorkerPool
+
+	with WorkerPool(time.sleep, processes=2, timeout=0.5) as pool:
+		results = pool.map([(0,), (5,), (0,)])
+		assert [status for status, _, _ in results] == ["SUCCESS", "TIMEOUT", "SUCCESS"]
+		assert pool.recycled == 1
+
+
+def _zygote_task(kind):
+	import os
+	import time
+	if kind == "hang":
+		time.sleep(5)
+	if kind == "exit":
+		raise SystemExit(1)
+	return os.getpid()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_zygote_forks_an_isolated_child_per_task():
+	from soe.zygote import ZygotePool
+
+	with ZygotePool(_zygote_task, preload=["json"], processes=2, timeout=0.5) as pool:
+		results = pool.map([("pid",), ("hang",), ("exit",), ("pid",)])
+		assert [status for status, _, _ in results] == ["SUCCESS", "TIMEOUT", "CRASH", "SUCCESS"]
+		assert results[0][1] != results[3][1]
+		assert pool.run("pid")[0] == "SUCCESS"
+		assert pool.restarts == 0
+
+
+def test_ast_cache_reparses_only_modified_files(tmp_path):
+	from soe.function_list.ast_cache import ASTCache
+	from soe.function_list.function_list import collect_functions_in_repo
+
+	repo = tmp_path / "repo"
+	repo.mkdir()
+	(repo / "a.py").write_text("def f(x):\n    return g(x)\n")
+	(repo / "b.py").write_text("def g(y, *args):\n    pass\n")
+	cache_file = tmp_path / "cache.json"
+
+	uncached = collect_functions_in_repo(str(repo))
+	assert collect_functions_in_repo(str(repo), cache=ASTCache(cache_file)) == uncached
+
+	cache = ASTCache(cache_file)
+	assert collect_functions_in_repo(str(repo), cache=cache) == uncached
+	assert (cache.hits, cache.misses) == (2, 0)
+
+	(repo / "b.py").write_text("def g(y, z):\n    pass\n")
+	cache = ASTCache(cache_file)
+	funcs = collect_functions_in_repo(str(repo), cache=cache)
+	assert (cache.hits, cache.misses) == (1, 1)
+	assert list(funcs["b.g"].params) == ["y", "z"]
+
+
+def test_repo_walker_honours_ignore_rules(tmp_path):
+	from soe.function_list.repo_walker import iter_python_files
+
+	for rel in ["pkg/a.py", "pkg/tests/t.py", "pkg/gen/x.py", "pkg/keep_gen.py", "build/b.py", "z.py"]:
+		(tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+		(tmp_path / rel).write_text("")
+	(tmp_path / ".gitignore").write_text("build/\n*gen*\n!keep_gen.py\n")
+
+	found = [os.path.relpath(p, tmp_path) for p in iter_python_files(str(tmp_path), {"tests"}, use_gitignore=True)]
+	assert found == ["z.py", os.path.join("pkg", "a.py"), os.path.join("pkg", "keep_gen.py")]
+	assert len(list(iter_python_files(str(tmp_path)))) == 6
+
+	# The function list scans every file unless asked to skip some
+	from soe.function_list.function_list import collect_functions_in_repo
+	from soe.function_list.repo_walker import IGNORE_DIRS
+	(tmp_path / "pkg" / "tests" / "t.py").write_text("def t():\n    pass\n")
+	(tmp_path / "build" / "b.py").write_text("def b():\n    pass\n")
+	assert set(collect_functions_in_repo(str(tmp_path))) == {"pkg.tests.t.t", "build.b.b"}
+	assert collect_functions_in_repo(str(tmp_path), ignore_dirs=IGNORE_DIRS, use_gitignore=True) == {}
+
+
+def test_call_graph_queries():
+	import pickle
+	from soe.function_list.call_graph import CallGraph
+
+	# a -> b -> c -> b, c -> d
+	names = ["a", "b", "c", "d"]
+	graph = CallGraph.from_adjacency(names, [[1], [2], [1, 3], []])
+
+	assert graph["c"] == {"b", "d"} and graph.get("x", set()) == set()
+	assert graph.callers("b") == ["a", "c"]
+	assert graph.transitive_callees("a") == {"b", "c", "d"}
+	assert graph.transitive_callers("d") == {"a", "b", "c"}
+	assert [sorted(names[i] for i in comp) for comp in graph.sccs()] == [["d"], ["b", "c"], ["a"]]
+	assert pickle.loads(pickle.dumps(graph)).transitive_callers("d") == {"a", "b", "c"}
+	assert CallGraph.from_json_dict(graph.to_json_dict()) == graph
+
+
+def test_fingerprints_delimit_strings():
+	from soe.run import _fingerprint
+	assert _fingerprint(["abuiltins.str|b", "c"]) != _fingerprint(["a", "bbuiltins.str|c"])
+	assert _fingerprint(("ab", "c")) != _fingerprint(("a", "bc"))
+	assert _fingerprint(["x" * 100]) == _fingerprint(["x" * 100])
+
+	# One node budget per value, however wide and deep it is
+	import time
+	wide = [[[[0] * 32] * 32] * 32] * 32
+	start = time.perf_counter()
+	fp = _fingerprint(wide)
+	assert time.perf_counter() - start < 0.1
+	assert fp == _fingerprint([[[[0] * 32] * 32] * 32] * 32) != _fingerprint([[[[1] * 32] * 32] * 32] * 32)
+
+
+def test_result_log_tolerates_crashes(tmp_path):
+	import json
+	from soe.result_log import ResultLog, read_log, compact
+
+	log = tmp_path / "log.jsonl"
+	with ResultLog(log) as rl:
+		rl.append({"n": 1})
+		rl.append({"n": 2})
+	with open(log, "a", encoding="utf-8") as f:
+		f.write('{"n": 3')
+	# A torn last line is skipped when reading
+	assert list(read_log(log)) == [{"n": 1}, {"n": 2}]
+
+	def add(state, record):
+		state["sum"] = state.get("sum", 0) + record["n"]
+
+	out = tmp_path / "out.json"
+	assert compact(log, out, add) == {"sum": 3}
+	assert json.loads(out.read_text()) == {"sum": 3}
+	# A failed compaction leaves the previous output in place
+	with pytest.raises(TypeError):
+		compact(log, out, lambda state, record: state.setdefault("bad", object()))
+	assert json.loads(out.read_text()) == {"sum": 3}
+	assert not (tmp_path / "out.json.tmp").exists()
+
+	# Reopening appends after the torn line is cut off...
+	with ResultLog(log, truncate=False) as rl:
+		rl.append({"n": 4})
+	assert [r["n"] for r in read_log(log)] == [1, 2, 4]
+	# ...and a complete record missing its newline is kept
+	with open(log, "a", encoding="utf-8") as f:
+		f.write('{"n": 5}')
+	with ResultLog(log, truncate=False) as rl:
+		rl.append({"n": 6})
+	assert [r["n"] for r in read_log(log)] == [1, 2, 4, 5, 6]
+	# Truncating starts over
+	ResultLog(log).close()
+	assert list(read_log(log)) == []
+
+
+def test_sample_store_roundtrip(tmp_path):
+	from soe.sample_store import SampleStore
+
+	with SampleStore(tmp_path / "store", segment_size=64) as store:
+		assert store.add("list", "a", [1, 2])
+		assert not store.add("list", "a", [1, 2])
+		assert store.add("str", "b", "x" * 100)
+		assert store.add("list", "c", [3])
+		assert store.load("list", 1) == [3]
+
+	store = SampleStore(tmp_path / "store")
+	assert sorted(store.keys()) == ["list", "str"]
+	assert store.fingerprints("list") == {"a", "c"}
+	assert list(store.samples("list")) == [[1, 2], [3]]
+	assert store.load("str", 0) == "x" * 100
+	assert len(list((tmp_path / "store").glob("seg-*.bin"))) == 3
+	store.close()
+
+
+def test_type_list_pickle_is_imported_into_the_store(tmp_path):
+	import pickle
+	from soe import run
+	from soe.sample_store import SampleStore
+
+	(tmp_path / "functions.pkl").write_bytes(pickle.dumps({}))
+	(tmp_path / "old.pkl").write_bytes(pickle.dumps({"int": [1, 2, 2], "str": ["a"]}))
+	out = tmp_path / "out"
+
+	run._type_seen.clear()
+	soe.soe(
+		tmp_path,
+		function_list_file=tmp_path / "functions.pkl",
+		type_list_file=tmp_path / "old.pkl",
+		output_dir=out,
+		no_log=True,
+		no_fuzz=True
+	)
+	assert dict(run.type_list.items()) == {"int": [1, 2], "str": ["a"]}
+	# The samples outlive the run without type_list.pkl
+	with SampleStore(out / "type_samples") as store:
+		assert store.to_type_list() == {"int": [1, 2], "str": ["a"]}
+
+
+def test_sample_store_tolerates_crashes(tmp_path):
+	from soe.sample_store import SampleStore, INDEX_FILE
+
+	path = tmp_path / "store"
+	with SampleStore(path) as store:
+		store.add("int", "a", 1)
+	with open(path / INDEX_FILE, "a", encoding="utf-8") as f:
+		f.write('{"k":"int","f":"b"')
+
+	with SampleStore(path) as store:
+		assert store.add("int", "c", 3)
+	with SampleStore(path) as store:
+		assert store.fingerprints("int") == {"a", "c"}
+		assert list(store.samples("int")) == [1, 3]
+	assert (path / INDEX_FILE).read_text().count("\n") == 2
+
+
+def test_resume_seeds_the_sample_pool_from_the_store(tmp_path):
+	import pickle
+	from soe import run
+	from soe.sample_store import SampleStore
+
+	(tmp_path / "functions.pkl").write_bytes(pickle.dumps({}))
+	out = tmp_path / "out"
+	with SampleStore(out / "type_samples") as store:
+		store.add("int", run._fingerprint(7), 7)
+
+	def start(resume):
+		run._type_seen.clear()
+		soe.soe(
+			tmp_path,
+			function_list_file=tmp_path / "functions.pkl",
+			output_dir=out,
+			no_log=True,
+			no_fuzz=True,
+			resume=resume
+		)
+		return dict(run.type_list.items())
+
+	assert start(resume=True) == {"int": [7]}
+	assert run._type_seen["int"] == {run._fingerprint(7)}
+	# A fresh campaign starts from an empty store
+	assert start(resume=False) == {}
+
+
+def _assign_target(n):
+	total = 0
+	for i in range(n):
+		label = f"{i}"
+		total += i
+	del label
+	pair = (total, [n])
+	return pair
+
+
+def test_assign_capture_matches_diff():
+	from soe import run
+
+	plan = run._store_plan(_assign_target.__code__)
+	first = _assign_target.__code__.co_firstlineno
+	assert plan[first + 1][0] == {"total"}
+	assert "label" in plan[first + 5][1]
+
+	captured = {}
+	for capture in ("diff", "assign"):
+		run.type_list.clear()
+		run._type_seen.clear()
+		run._run_settrace(run._FrameTracker(_assign_target, capture=capture), [3])
+		captured[capture] = {k: sorted(map(repr, v)) for k, v in run.type_list.items()}
+	assert captured["assign"] == captured["diff"]
+	assert "tuple" in captured["assign"] and "str" in captured["assign"]
+
+
+def _passthrough(fn):
+	return fn
+
+
+@_passthrough
+def _allowlisted(a, *rest, b=1, **extra):
+	return json_dumps_len([a, b])
+
+
+def json_dumps_len(value):
+	import json
+	return len(json.dumps(value))
+
+
+def test_capture_plans_follow_function_list():
+	import json
+	import soe._global as _global
+	from soe import run
+
+	_global.set_function("tests.test_soe._allowlisted", {
+		"params": {}, "filename": __file__, "lineno": _allowlisted.__code__.co_firstlineno + 1,
+	})
+	try:
+		run._refresh_allowlist(_global.get_function_list())
+		plan = run._capture_plan(_allowlisted.__code__)
+		assert plan == ("tests.test_soe._allowlisted", ("a", "b"), "rest", "extra")
+		# Same file, not in the function list: traced without argument capture
+		assert run._capture_plan(json_dumps_len.__code__).qualname is None
+		assert run._capture_plan(json.dumps.__code__) is None
+
+		tracker = run._FrameTracker(_allowlisted)
+		run._run_settrace(tracker, ["x"])
+		assert not tracker.tracked_frames
+	finally:
+		_global.get_function_list().pop("tests.test_soe._allowlisted", None)
+
+
+def test_callees_in_unlisted_modules_are_traced(traced_module):
+	import soe._global as _global
+	from soe import run
+
+	traced_module("unlisted_helper", "def helper(n):\n    count = n + 1\n    missing = None\n    return count\n")
+	traced_module("listed_entry", "import unlisted_helper\n\ndef entry(x):\n    return unlisted_helper.helper(len(x))\n", entry={"x": {}})
+	entry = _global.get_function("listed_entry.entry")
+
+	# Listed elsewhere, and with no file of the target listed at all
+	for function_list in ({"listed_entry.entry": entry}, {}):
+		run.type_list.clear()
+		run._type_seen.clear()
+		_global.set_function_list(function_list)
+		run.run("listed_entry.entry", ["abc"])
+		assert "NoneType" in run.type_list and 4 in run.type_list["int"]
+
+
+def test_generator_resumes_count_arguments_once(traced_module):
+	import soe._global as _global
+	from soe import run
+
+	source = (
+		"def gen(n):\n    for i in range(n):\n        yield i\n\n"
+		"def consume(n):\n    return sum(gen(n))\n"
+	)
+	for backend in ["settrace"] + (["monitoring"] if run.has_monitoring() else []):
+		# Fresh stats for every backend
+		traced_module("genmod", source, gen={"n": {}}, consume={"n": {}})
+		run.run("genmod.consume", [50], backend=backend)
+		assert _global.get_function("genmod.gen")["params"]["n"] == {"int": 1}
+		assert _global.get_function("genmod.consume")["params"]["n"] == {"int": 1}
+
+
+def test_adaptive_timeouts_and_budget(tmp_path):
+	from soe.scheduler import AdaptiveTimeouts, CampaignBudget, parse_duration
+
+	assert parse_duration("30m") == 1800
+	assert parse_duration("1h30m") == 5400
+	assert parse_duration("45") == 45
+	with pytest.raises(ValueError):
+		parse_duration("soon")
+
+	timeouts = AdaptiveTimeouts(default=0.5, factor=4.0)
+	assert timeouts.timeout_for("m", None, "f") == 0.5
+	timeouts.observe("m", None, "f", "SUCCESS", 0.1)
+	assert timeouts.timeout_for("m", None, "f") == pytest.approx(0.4)
+	# Unseen functions of a known module use the module's run times
+	assert timeouts.timeout_for("m", "C", "g") == pytest.approx(0.4)
+	timeouts.observe("m", "C", "g", "TIMEOUT", 0.4)
+	assert timeouts.timeout_for("m", "C", "g") == pytest.approx(1.6)
+	assert timeouts.timeout_for("m", None, "h") == pytest.approx(0.4)
+
+	timeouts.save(tmp_path / "timings.json")
+	warm = AdaptiveTimeouts()
+	warm.load(tmp_path / "timings.json")
+	assert warm.timeout_for("m", None, "f") == pytest.approx(0.4)
+
+	assert CampaignBudget(None).cap(2.0, 10) == 2.0
+	budget = CampaignBudget(10, processes=2)
+	assert budget.cap(5.0, 10) <= 2.0
+	assert not budget.exhausted()
+
+
+def _only_strings(a, b):
+	if not isinstance(a, str):
+		raise TypeError(a)
+	return a + str(b)
+
+
+def test_coverage_guided_fuzzing(monkeypatch):
+	import random
+	from soe import freq_list
+
+	monkeypatch.setattr(freq_list, "_coverage_root", os.path.dirname(__file__))
+	random.seed(0)
+	gen = freq_list.FuzzGenerator()
+	runs = freq_list.fuzz_coverage_guided(_only_strings, ["a", "b"], gen, 64)
+	assert runs and all(r["a"] == "str" for r in runs)
+	# Each combination runs at most once
+	assert len({tuple(r.items()) for r in runs}) == len(runs)
+
+	collector = freq_list.CoverageCollector(os.path.dirname(__file__))
+	new_arcs, exc = collector.run(_only_strings, 1, 2)
+	assert new_arcs and isinstance(exc, TypeError)
+	# Same path again: nothing new
+	assert collector.run(_only_strings, 3, 4)[0] == 0
+	new_arcs, exc = collector.run(_only_strings, "x", 4)
+	assert new_arcs and exc is None
+
+
+def _needs_number(a, b):
+	return len(b) + a
+
+
+def test_type_bandit_blames_and_prunes():
+	import random
+	from soe import freq_list
+
+	universe = freq_list.FuzzGenerator().universe
+	bandit = freq_list.TypeBandit(["a", "b"], universe)
+	code = _needs_number.__code__
+	try:
+		_needs_number(1, 5)
+	except TypeError as e:
+		# "object of type 'int' has no len()": both are ints, both quoted
+		assert bandit.blame((int, int), e, code) == ["a", "b"]
+	try:
+		_needs_number(1.0, 5)
+	except TypeError as e:
+		assert bandit.blame((float, int), e, code) == ["b"]
+
+	for _ in range(freq_list.PRUNE_AFTER):
+		bandit.update((str, dict), ValueError("b rejected 'dict'"), code)
+	assert dict not in bandit.arms["b"] and dict in bandit.arms["a"]
+
+	random.seed(1)
+	runs = freq_list.fuzz_bandit(_needs_number, ["a", "b"], freq_list.FuzzGenerator(), 200)
+	accepted = {(k, v) for r in runs for k, v in r.items()}
+	assert ("a", "int") in accepted and ("b", "str") in accepted
+	assert ("b", "int") not in accepted
+
+
+def test_type_combinations_cover_every_pair():
+	import itertools
+	from soe import freq_list
+
+	universe = freq_list.FuzzGenerator().universe
+	small = freq_list.type_combinations(2, universe)
+	assert len(small) == len(set(small)) == len(universe) ** 2
+
+	rows = freq_list.pairwise_array(10, len(universe))
+	assert len(rows) < 200 and len({tuple(r) for r in rows}) == len(rows)
+	for i, j in itertools.combinations(range(10), 2):
+		assert {(r[i], r[j]) for r in rows} == set(itertools.product(range(len(universe)), repeat=2))
+	assert freq_list.pairwise_array(10, 8) == rows
+
+
+def test_parallel_fuzz_finds_serial_types(tmp_path, traced_module):
+	import json
+	from soe import run
+	from soe.fuzzer import fuzz
+
+	src = traced_module(
+		"shardmod",
+		"def wrap(x):\n    items = [x, len(x)]\n    return tuple(items)\n\n"
+		"def scale(x):\n    return {x: 2.5}\n\n"
+		"def twice(x):\n    return x * 2\n",
+		wrap={"x": {}}, scale={"x": {}}, twice={"x": {}}
+	).parent
+
+	results = {}
+	for run_id, jobs in (("serial", 1), ("serial-again", 1), ("parallel", 2)):
+		run.type_list.clear()
+		run._type_seen.clear()
+		out = tmp_path / run_id
+		out.mkdir()
+		fuzz(src, out, jobs=jobs)
+		results[run_id] = {k: sorted(map(repr, v)) for k, v in run.type_list.items()}
+		assert set(json.loads((out / "type_list.json").read_text())) == set(results[run_id])
+
+	# Input draws are seeded, so serial campaigns are reproducible
+	assert results["serial"] == results["serial-again"]
+	# Harvested inputs flow differently between shards, so only the core agrees
+	for run_id in ("serial", "parallel"):
+		assert {"str", "list", "tuple", "dict"} <= set(results[run_id])
+
+
+class _Graph:
+	def __init__(self):
+		self.nodes = []
+
+
+def test_sample_pool_inputs_and_call_order():
+	from soe.sample_pool import SamplePool
+	from soe.fuzzer import caller_first_order
+	from soe.function_list.call_graph import CallGraph
+
+	graph = _Graph()
+	pool = SamplePool({"int": [3], "tests.test_soe._Graph": [graph]})
+	args = pool.args_for({"self": {}, "graph": {}, "count": {"int": 2}, "*rest": {}})
+	assert isinstance(args[0], _Graph) and args[0] is not graph and args[1] == 3
+	args[0].nodes.append(1)
+	assert graph.nodes == []
+	assert SamplePool({}).args_for({"x": {}}) is None
+
+	# main -> helper -> leaf, caller first
+	calls = CallGraph.from_adjacency(["m.leaf", "m.helper", "m.main"], [[], [0], [1]])
+	assert caller_first_order(["m.leaf", "m.other", "m.main", "m.helper"], calls) == ["m.main", "m.helper", "m.leaf", "m.other"]
+
+
+def test_checkpoint_resume_skips_done_functions(tmp_path, traced_module):
+	import json
+	from soe import run
+	from soe.checkpoint import Checkpoint
+	from soe.fuzzer import fuzz
+	from soe.result_log import read_log
+
+	src = traced_module(
+		"ckptmod",
+		"def first(x):\n    return [x]\n\ndef second(x):\n    return {x: 1}\n",
+		first={"x": {}}, second={"x": {}}
+	).parent
+	names = ["ckptmod.first", "ckptmod.second"]
+	out = tmp_path / "out"
+	out.mkdir()
+
+	saves = []
+	checkpoint = Checkpoint(out, interval=3600)
+	checkpoint.before_save(lambda: saves.append(1))
+	checkpoint.done.add("ckptmod.second")
+	fuzz(src, out, checkpoint=checkpoint)
+	assert saves and "list" in run.type_list and "dict" not in run.type_list
+
+	resumed = Checkpoint(out, resume=True)
+	assert resumed.done == set(names)
+	before = len(list(read_log(out / "type_list.jsonl")))
+	fuzz(src, out, checkpoint=resumed)
+	# Nothing ran again and the log was appended to, not truncated
+	assert len(list(read_log(out / "type_list.jsonl"))) == before > 0
+
+	# A crash while logging `second`, before the checkpoint counted it
+	with open(out / "type_list.jsonl", "a", encoding="utf-8") as f:
+		f.write('{"function":"ckptmod.sec')
+	(out / "checkpoint.json").write_text(json.dumps({"done": ["ckptmod.first"]}))
+	fuzz(src, out, checkpoint=Checkpoint(out, resume=True))
+	assert [r["function"] for r in read_log(out / "type_list.jsonl")][-1] == "ckptmod.second"
+	assert {"list", "dict"} <= set(json.loads((out / "type_list.json").read_text()))
+
+
+def _bump_db_stats(db, n):
+	for _ in range(n):
+		db.add_param_stats({("dbmod.scale", "arr", "numpy.ndarray"): 1, ("dbmod.scale", "factor", "int"): 2})
+
+
+def test_function_db_indexes_and_concurrent_upserts(tmp_path, traced_module):
+	import soe._global as _global
+	from concurrent.futures import ProcessPoolExecutor
+	from soe import run
+	from soe.function_db import FunctionDB
+	from soe.function_list.call_graph import CallGraph
+
+	path = traced_module("dbmod", "def scale(arr, factor=2, *rest):\n    return [arr] * factor\n\ndef name(x):\n    return x\n")
+	db = FunctionDB(tmp_path / "functions.db")
+	db.replace_all({
+		"dbmod.scale": {"params": {"arr": {}, "factor": {"int": 1}, "*rest": {}}, "filename": str(path), "lineno": 1, "node": 0},
+		"dbmod.name": {"params": {"x": {"str": 4}}, "filename": str(path), "lineno": 4, "node": 1},
+	})
+	db.store_call_graph(CallGraph.from_adjacency(["dbmod.name", "dbmod.scale"], [[], [0]]))
+	assert db["dbmod.scale"]["params"] == {"arr": {}, "factor": {"int": 1}, "*rest": {}}
+	assert db.functions_in_module("dbmod") == ["dbmod.scale", "dbmod.name"]
+	assert db.callees("dbmod.scale") == ["dbmod.name"] and db.call_graph().callers("dbmod.name") == ["dbmod.scale"]
+
+	# Every worker upserts into the same file
+	with ProcessPoolExecutor(max_workers=3) as ex:
+		list(ex.map(_bump_db_stats, [db] * 3, [20] * 3))
+	assert db["dbmod.scale"]["params"]["arr"] == {"numpy.ndarray": 60}
+	assert db["dbmod.scale"]["params"]["factor"] == {"int": 121}
+	assert db.functions_accepting("numpy.ndarray") == ["dbmod.scale"]
+
+	# Traced argument types land in the database behind _global once flushed
+	_global.set_function_db(db)
+	try:
+		run.run("dbmod.name", [[1]])
+		assert _global.functions_accepting("list") == []
+		_global.flush_param_stats()
+		assert _global.functions_accepting("list") == ["dbmod.name"]
+		run.run("dbmod.scale", ["a", 1, 5])
+		_global.flush_param_stats()
+		assert db["dbmod.scale"]["params"]["*rest"] == {"tuple": 1}
+	finally:
+		_global.set_function_db(None)
+		db.close()
+
+
+def test_resume_on_a_function_db_counts_each_run_once(tmp_path, traced_module):
+	import soe._global as _global
+	from soe import run
+	from soe.checkpoint import Checkpoint
+	from soe.function_db import FunctionDB
+	from soe.fuzzer import fuzz
+
+	path = traced_module("rmod", "def a(x):\n    return x\n")
+	src = path.parent
+	out = tmp_path / "out"
+	db = FunctionDB(tmp_path / "functions.db")
+	db.replace_all({"rmod.a": {"params": {"x": {}}, "filename": str(path), "lineno": 1}})
+
+	def campaign(resume, crash):
+		run.type_list.clear()
+		run._type_seen.clear()
+		checkpoint = Checkpoint(out, interval=3600, resume=resume)
+		checkpoint.before_save(_global.flush_param_stats)
+		if crash:
+			# Killed before the first checkpoint
+			checkpoint.save = lambda: None
+		fuzz(src, out, checkpoint=checkpoint)
+
+	_global.set_function_db(db)
+	try:
+		campaign(resume=False, crash=True)
+		assert db["rmod.a"]["params"]["x"] == {}
+		# The killed process never flushed, a new one starts with nothing pending
+		_global.set_function_db(db)
+		campaign(resume=True, crash=False)
+		assert sum(db["rmod.a"]["params"]["x"].values()) == 1
+		campaign(resume=True, crash=False)
+		assert sum(db["rmod.a"]["params"]["x"].values()) == 1
+	finally:
+		_global.set_function_db(None)
+		db.close()
+
+
+class _NoRepr(dict):
+	def __repr__(self):
+		raise AssertionError("formatted eagerly")
+
+
+def test_sharded_registry_snapshots_and_global_setters():
+	import threading
+	import soe._global as _global
+	from soe import run
+	from soe.registry import ShardedRegistry
+
+	reg = ShardedRegistry({"b": 1, "a": 2}, shards=4)
+	snap = reg.snapshot()
+	reg["c"] = 3
+	del reg["b"]
+	reg.apply("a", lambda v: v + 10)
+	# Snapshots keep their contents, iteration follows insertion order
+	assert dict(snap) == {"b": 1, "a": 2} and list(reg) == ["a", "c"] and reg["a"] == 12
+	assert reg.snapshot() is reg.snapshot()
+
+	def writer(t):
+		for i in range(500):
+			reg[(t, i)] = i
+			reg.setdefault("shared", []).append(t)
+	threads = [threading.Thread(target=writer, args=(t,)) for t in range(4)]
+	for th in threads:
+		th.start()
+	for th in threads:
+		th.join()
+	assert len(reg) == 2 + 4 * 500 + 1 and len(reg["shared"]) == 4 * 500
+
+	# set_*_list used to bind a local; the registries now take the contents
+	saved = dict(_global.get_type_list().items())
+	try:
+		_global.set_type_list(_NoRepr({"int": [1]}))
+		assert run.type_list is _global.get_type_list() and dict(run.type_list.items()) == {"int": [1]}
+	finally:
+		_global.set_type_list(saved)
+	_global.set_function_list(_NoRepr({"m.f": {"params": {"x": {}}}}))
+	try:
+		_global.add_param_stats({("m.f", "x", "int"): 2, ("m.gone", "x", "int"): 1})
+		assert _global.get_function("m.f")["params"] == {"x": {"int": 2}}
+		assert _global.functions_accepting("int") == ["m.f"]
+	finally:
+		_global.set_function_list({})
+
+
+def _profiled_target(n):
+	items = [str(i) for i in range(n)]
+	return len(items)
+
+
+def test_profiling_counts_targets_and_samples(tmp_path):
+	import json
+	import soe._global as _global
+	from soe import run, profiling
+
+	name = "tests.test_soe._profiled_target"
+	_global.set_function(name, {"params": {"n": {}}, "filename": __file__, "lineno": _profiled_target.__code__.co_firstlineno})
+	profiler = profiling.enable(cprofile=True)
+	try:
+		with profiling.phase("targets"):
+			run.run(name, [3])
+			run.run(name, [3])
+		worker = profiling.Profiler()
+		worker.record_target(name, 0.5, 1.0)
+		worker.count("tracer.call_events", 7)
+		profiler.merge(worker.export())
+	finally:
+		assert profiling.disable() is profiler
+		_global.get_function_list().pop(name, None)
+	assert profiling.current() is None
+	with profiling.phase("ignored"):
+		pass
+
+	report = profiler.report()
+	assert [p["name"] for p in report["phases"]] == ["targets"]
+	assert report["targets"]["slowest"][0]["runs"] == 3 and report["targets"]["run_seconds"] >= 1.0
+	counters = report["counters"]
+	assert counters["tracer.call_events"] >= 9 and counters["tracer.line_events"] > 0
+	# The second run only finds duplicates
+	assert counters["samples.samples_added"] > 0 and counters["samples.duplicates_rejected"] > 0
+	assert report["hot_functions"]
+
+	profiler.write(tmp_path)
+	assert json.loads((tmp_path / "profile.json").read_text())["counters"] == counters
+	assert "tracer.line_events" in (tmp_path / "profile.txt").read_text() and (tmp_path / "profile.pstats").is_file()